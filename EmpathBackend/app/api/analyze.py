@@ -1,100 +1,229 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from sqlalchemy.orm import Session
-import uuid, os, shutil
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+import threading
+import numpy as np
 
-from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.api.deps import get_current_user_async, get_idempotency
 
 # 🔁 Shared message pipeline
-from app.services.message_service import handle_text_message
+from app.services.conv_services import UserTurn
+from app.services.ai_service import DEFAULT_MAX_TOKENS
+from app.services.disconnect import ClientDisconnected, DisconnectWatch
+from app.services.generations import new_generation, resume
+from app.services.idempotency import Idempotency, fingerprint
 
 # ===== ML pipelines =====
-from app.llm.huberta import predict_speech_emotion
-from app.llm.roberta import predict_emotion
+from app.core.config import settings
+from app.llm.huberta import predict_speech_emotion_async
+from app.llm.inference import inference_executor, InferenceBusy
+from app.llm.registry import registry
+from app.llm.single_flight import SingleFlight, audio_key
+from app.utils.audio import decode_audio
 
 # ===== ASR + Translation =====
-import whisper
 from deep_translator import GoogleTranslator
 
 router = APIRouter(prefix="/analyze", tags=["Analyze"])
 
-# Load Whisper ONCE (CPU-safe)
-whisper_model = whisper.load_model("small")
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+}
 
 
-def speech_to_text_ml(audio_path: str) -> str:
-    result = whisper_model.transcribe(audio_path, language="ml")
+def load_whisper():
+    import whisper
+
+    print(f"🔹 Loading Whisper ({settings.WHISPER_MODEL})...")
+    return whisper.load_model(settings.WHISPER_MODEL)
+
+
+# Load Whisper ONCE, on first voice note or warm-up (CPU-safe)
+registry.register("whisper", load_whisper)
+
+# transcribe() installs KV-cache hooks on the shared model,
+# so only one transcription may run on it at a time
+whisper_lock = threading.Lock()
+
+
+def speech_to_text_ml(audio: str | np.ndarray) -> str:
+    with whisper_lock:
+        result = registry.get("whisper").transcribe(audio, language="ml")
     return result["text"].strip()
 
-def speech_to_text_en(audio_path: str) -> str:
+def speech_to_text_en(audio: str | np.ndarray) -> str:
     """
-    English ASR using Whisper
+    English ASR using Whisper (file path or 16 kHz float32 samples)
     """
-    result = whisper_model.transcribe(audio_path, language="en")
+    with whisper_lock:
+        result = registry.get("whisper").transcribe(audio, language="en")
     return result["text"].strip()
 
 
+# The same recording uploaded twice at once is transcribed once
+asr_flight = SingleFlight("asr")
+
+
+async def speech_to_text_en_async(audio: np.ndarray) -> str:
+    return await asr_flight.run(audio_key(audio), inference_executor.run, speech_to_text_en, audio)
+
+
 def translate_ml_to_en(text: str) -> str:
     return GoogleTranslator(source="ml", target="en").translate(text)
 
 
 
 from fastapi.responses import StreamingResponse
-import json
 import asyncio
 
 @router.post("/{conversation_id}/audio")
 async def analyze_audio(
     conversation_id: str,
-    file: UploadFile = File(...),
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    file: UploadFile | None = File(None),
+    user=Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency: Idempotency = Depends(get_idempotency),
 ):
-    temp_file = f"tmp_{uuid.uuid4()}.wav"
-
-    with open(temp_file, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    try:
-        # 1️⃣ Speech → Text
-        transcribed_text = speech_to_text_en(temp_file)
-        if not transcribed_text:
-            raise HTTPException(status_code=400, detail="Empty transcription")
-
-        # 2️⃣ Emotion
-        emotion = predict_speech_emotion(temp_file)
-        print("Emotion Detected:",emotion)
-        # 3️⃣ Process message (same as text)
-        result = await process_user_message(
-            emotion=emotion,
-            conversation_id=conversation_id,
-            user_text=transcribed_text,
-            user=user,
-            db=db,
-        )
-
-        assistant_reply = result["reply"]
-
-        # 4️⃣ STREAM RESPONSE (SSE)
-        async def event_generator():
-            # Optional: send transcription to frontend
-            yield f"data: {json.dumps({'transcript': transcribed_text})}\n\n"
-
-            # Stream assistant reply token by token
-            for token in assistant_reply.split():
-                yield f"data: {json.dumps({'content': token + ' '})}\n\n"
-                await asyncio.sleep(0.03)
-
-            yield f"data: {json.dumps({'done': True})}\n\n"
-
-        return StreamingResponse(
-            event_generator(),
-            media_type="text/event-stream",
-        )
-
-    finally:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+    # A reconnect resumes the buffered reply instead of processing the
+    # audio again, so it needn't upload the recording again either
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        frames = await resume(last_event_id, owner=f"{user.id}:{conversation_id}")
+        return StreamingResponse(frames, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    if file is None:
+        raise HTTPException(status_code=422, detail="Missing audio file")
+
+    data = await file.read()
+
+    # A retry with the same Idempotency-Key joins or replays the original
+    # instead of transcribing the upload again
+    replay = await idempotency.claim(fingerprint(data), owner=f"{user.id}:{conversation_id}")
+    if replay is not None:
+        return StreamingResponse(replay, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    # The inference stages are cancelled if the client goes away
+    turn = None
+    async with DisconnectWatch(request) as watch:
+        try:
+            # 1️⃣ Speech → Text and 2️⃣ Emotion (independent, run together
+            # on one in-memory 16 kHz decode of the upload)
+            try:
+                try:
+                    audio = await watch.run(inference_executor.run(decode_audio, data))
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Unreadable audio")
+
+                if audio.size == 0:
+                    raise HTTPException(status_code=400, detail="Empty audio")
+
+                transcribed_text, emotion = await watch.run(asyncio.gather(
+                    speech_to_text_en_async(audio),
+                    predict_speech_emotion_async(audio),
+                ))
+            except InferenceBusy as e:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Voice processing is busy, please retry shortly",
+                    headers={"Retry-After": str(e.retry_after)},
+                )
+
+            if not transcribed_text:
+                raise HTTPException(status_code=400, detail="Empty transcription")
+
+            print("Emotion Detected:",emotion)
+            # 3️⃣ Process message (same as text): validate, route, save it.
+            # Not cancelled midway: that would abort the commit and leave
+            # the user message maybe saved, maybe not
+            turn = UserTurn(
+                emotion=emotion,
+                conversation_id=conversation_id,
+                normalized_text=transcribed_text,
+                user_text=transcribed_text,
+                user=user,
+                db=db,
+            )
+            canned_reply = await turn.start()
+            if watch.disconnected:
+                raise ClientDisconnected()
+        except ClientDisconnected:
+            if turn is not None and turn.extraction is not None:
+                turn.extraction.cancel()
+            # Nobody is listening; nginx's "client closed request"
+            raise HTTPException(status_code=499, detail="Client closed request")
+
+    # 4️⃣ STREAM RESPONSE (SSE), relaying the model output as it's generated
+    generation = await new_generation(f"{user.id}:{conversation_id}")
+    await idempotency.started(generation.id)
+    if canned_reply is not None:
+        await idempotency.finished(turn.reply_message.id)
+
+    async def event_generator():
+        sse = generation.sse()
+        saved = False
+
+        # Optional: send transcription to frontend
+        yield sse.event({"transcript": transcribed_text})
+
+        if canned_reply is not None:
+            yield sse.content(canned_reply)
+            yield sse.done()
+            return
+
+        # The reply can outlive this request (a client may resume it),
+        # so it is saved on a session of its own
+        async with AsyncSessionLocal() as reply_db:
+            turn.uow.bind(reply_db)
+            try:
+                async with DisconnectWatch(generation) as watch:
+                    watch.link(turn.extraction)
+
+                    tokens = watch.relay(turn.reply_tokens(), budget=DEFAULT_MAX_TOKENS)
+                    async for frame in sse.relay(tokens):
+                        yield frame
+
+                    turn.merge(await watch.run(turn.extraction))
+
+                    # The rest of the final reply: fallback text, intake question
+                    final_reply = turn.compose(sse.text)
+                    rest = final_reply[len(sse.text.strip()):]
+                    if rest:
+                        yield sse.content(rest)
+
+                    saved = True
+                    await turn.save(final_reply)
+                    await idempotency.finished(turn.reply_message.id)
+
+                    yield sse.done()
+
+            except ClientDisconnected:
+                # The client left and didn't resume within the grace period
+                if not saved:
+                    await turn.save_partial(sse.text)
+                    if turn.reply_message is not None:
+                        await idempotency.finished(turn.reply_message.id)
+
+            except asyncio.CancelledError:
+                # Shutting down mid-reply
+                if not saved:
+                    await turn.save_partial(sse.text)
+                    if turn.reply_message is not None:
+                        await idempotency.finished(turn.reply_message.id)
+                raise
+
+            finally:
+                # No assistant message saved: a retry starts over
+                await idempotency.abandon()
+
+    generation.start(event_generator())
+
+    return StreamingResponse(
+        generation.follow(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 
@@ -203,7 +332,6 @@ async def analyze_audio(
 #         if os.path.exists(temp_file):
 #             os.remove(temp_file)
 
-from app.services.conv_services import process_user_message
 # @router.post("/{conversation_id}/audio")
 # async def analyze_audio(
 #     conversation_id: str,
@@ -1,39 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from app.api.deps import get_current_user
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_current_user_async, get_idempotency
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_async_db
 from app.models.conversation import Conversation
 from app.models.message import Message
-from app.models.incident import Incident
-from app.services.ai_service import call_mistral
-from app.services.incident_service import (
-    INCIDENT_TEMPLATE,
-    merge_entities,
-    completion_percentage
+from app.services.ai_service import DEFAULT_MAX_TOKENS, stream_ai_response
+from app.services.disconnect import ClientDisconnected, DisconnectWatch
+from app.services.generations import new_generation, resume
+from app.services.idempotency import Idempotency, fingerprint
+from app.services.message_uow import MessageUnitOfWork
+from app.services.context_builder import context_builder
+from app.services.conv_services import detect_text_emotion
+from app.schemas.conversation import conversation_out, message_out
+from app.utils.sse import SSEStream
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    cursor_key,
+    keyset_page
 )
 
 from app.llm.incident_assistant.intake.entity_extraction import extract_entities
 from app.llm.incident_assistant.intake.questioning import generate_next_question
-from app.llm.incident_assistant.responses.empathy import empathetic_response
 from app.llm.incident_assistant.responses.pocso import pocso_message
 from app.llm.incident_assistant.responses.high_risk import high_risk_message
 from app.llm.incident_assistant.safety.router import route_request
+from app.llm.incident_assistant.prompt_engine import prompt_engine
 
-import json
+import asyncio
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+}
+
 
 # =========================
 # GET ALL CONVERSATIONS
 # =========================
 @router.get("")
-def get_all(user=Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_all(
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user=Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Most recently updated first. `before=<conversation id>` pages to
+    older conversations, `after=<conversation id>` to newer ones.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after")
+
+    sort_key = (Conversation.updated_at, Conversation.id)
+    cursor_id = before or after
+    cursor = None
+    if cursor_id:
+        cursor = await cursor_key(
+            db, sort_key, Conversation.id, cursor_id, Conversation.user_id == user.id
+        )
+
+    conversations, has_more = await keyset_page(
+        db,
+        select(Conversation).where(Conversation.user_id == user.id),
+        sort_key,
+        before=cursor if before else None,
+        after=cursor if after else None,
+        limit=limit,
+    )
+
     return {
-        "conversations": db.query(Conversation)
-        .filter_by(user_id=user.id)
-        .all()
+        "conversations": [conversation_out(c) for c in reversed(conversations)],
+        "hasMore": has_more,
     }
 
 
@@ -41,30 +85,61 @@ def get_all(user=Depends(get_current_user), db: Session = Depends(get_db)):
 # CREATE CONVERSATION
 # =========================
 @router.post("")
-def create_conversation(data: dict, user=Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_conversation(data: dict, user=Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     convo = Conversation(
         user_id=user.id,
         title=data.get("title", "New Chat")
     )
     db.add(convo)
-    db.commit()
-    db.refresh(convo)
-    return convo
+    await db.commit()
+    await db.refresh(convo)
+    return conversation_out(convo)
 
 
 # =========================
 # GET MESSAGES
 # =========================
 @router.get("/{id}/messages")
-def get_messages(id: str, user=Depends(get_current_user), db: Session = Depends(get_db)):
-    return {
-        "messages": db.query(Message)
+async def get_messages(
+    id: str,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user=Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Oldest first, latest page by default. `before=<message id>` loads
+    earlier messages, `after=<message id>` later ones.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after")
+
+    sort_key = (Message.created_at, Message.id)
+    cursor_id = before or after
+    cursor = None
+    if cursor_id:
+        cursor = await cursor_key(
+            db, sort_key, Message.id, cursor_id, Message.conversation_id == id
+        )
+
+    messages, has_more = await keyset_page(
+        db,
+        select(Message)
         .join(Conversation)
-        .filter(
+        .where(
             Conversation.user_id == user.id,
             Message.conversation_id == id
-        )
-        .all()
+        ),
+        sort_key,
+        before=cursor if before else None,
+        after=cursor if after else None,
+        limit=limit,
+    )
+
+    return {
+        "messages": [message_out(m) for m in messages],
+        "hasMore": has_more,
     }
 
 
@@ -72,29 +147,34 @@ def get_messages(id: str, user=Depends(get_current_user), db: Session = Depends(
 # SEND MESSAGE (MAIN LOGIC)
 # =========================
 @router.post("/{id}/messages")
-def send_message(
+async def send_message(
     id: str,
     body: dict,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    user=Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency: Idempotency = Depends(get_idempotency),
 ):
 
+    # A reconnect resumes the buffered reply instead of sending again
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        frames = await resume(last_event_id, owner=f"{user.id}:{id}")
+        return StreamingResponse(frames, media_type="text/event-stream", headers=SSE_HEADERS)
+
     user_text = body.get("content", "").strip()
     if not user_text:
         raise HTTPException(status_code=400, detail="Empty message")
 
-    # 1️⃣ Validate conversation
-    conversation = db.query(Conversation).filter_by(id=id).first()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    # A retry with the same Idempotency-Key joins or replays the original
+    replay = await idempotency.claim(fingerprint(user_text), owner=f"{user.id}:{id}")
+    if replay is not None:
+        return StreamingResponse(replay, media_type="text/event-stream", headers=SSE_HEADERS)
 
-    # 2️⃣ Save USER message
-    db.add(Message(
-        conversation_id=id,
-        role="user",
-        content=user_text
-    ))
-    db.commit()
+    # 1️⃣ Validate conversation (+ load its incident)
+    uow = MessageUnitOfWork(db, id)
+    if not await uow.load():
+        raise HTTPException(status_code=404, detail="Conversation not found")
 
     # =====================================================
     # 🔥 SAFETY ROUTING FIRST
@@ -105,22 +185,24 @@ def send_message(
     if mode["mode"] == "HIGH_RISK":
         reply = high_risk_message()
 
-        db.add(Message(conversation_id=id, role="assistant", content=reply))
-        db.commit()
+        uow.add_message("user", user_text)
+        message = await uow.finish(reply)
+        await idempotency.finished(message.id)
 
         async def stream_hr():
-            yield f"data: {json.dumps({'content': reply, 'done': True})}\n\n"
+            yield SSEStream().content(reply, done=True)
 
         return StreamingResponse(stream_hr(), media_type="text/event-stream")
 
     if mode["mode"] == "POCSO":
         reply = pocso_message()
 
-        db.add(Message(conversation_id=id, role="assistant", content=reply))
-        db.commit()
+        uow.add_message("user", user_text)
+        message = await uow.finish(reply)
+        await idempotency.finished(message.id)
 
         async def stream_pc():
-            yield f"data: {json.dumps({'content': reply, 'done': True})}\n\n"
+            yield SSEStream().content(reply, done=True)
 
         return StreamingResponse(stream_pc(), media_type="text/event-stream")
 
@@ -128,109 +210,142 @@ def send_message(
     # ✅ NORMAL FLOW
     # =====================================================
 
-    incident = db.query(Incident).filter_by(conversation_id=id).first()
+    # Earlier turns within the token budget (loaded before the new message)
+    context = await context_builder.build(db, id)
 
-    if not incident:
-        incident = Incident(
-            conversation_id=id,
-            data=INCIDENT_TEMPLATE.copy(),
-            completion_percentage=0.0
-        )
-        db.add(incident)
-        db.commit()
-        db.refresh(incident)
+    # 2️⃣ Save USER message (+ new Incident) before streaming starts,
+    # so it isn't lost if generation fails
+    user_message = uow.add_message("user", user_text)
+    state = uow.incident_state()
+    await uow.commit()
 
-    # 🔹 Extract entities
-    extracted = extract_entities(user_text)
-    incident.data = merge_entities(dict(incident.data), extracted)
-    incident.completion_percentage = completion_percentage(incident.data)
+    # 🔹 Extract entities while the reply is generated
+    extraction = asyncio.create_task(extract_entities(user_text))
+    text_emotion = asyncio.create_task(detect_text_emotion(user_text))
+    if settings.EXTRACTION_MODE == "sequential":
+        await extraction
 
-    db.add(incident)
-    db.commit()
-    db.refresh(incident)
+    generation = await new_generation(f"{user.id}:{id}")
+    await idempotency.started(generation.id)
 
     async def stream():
-
-        # 1️⃣ ALWAYS generate normal AI reply
-        ai_prompt = f"""
-You are a compassionate legal counselor AI.
-
-Respond to the user's latest message in a warm, supportive, counselor-like tone.
-
-Keep it:
-- Calm
-- Human
-- Not robotic
-- Not too long
-
-User message:
-{user_text}
-"""
-
-        ai_reply = call_mistral(ai_prompt).strip()
-
-        if not ai_reply:
-            ai_reply = "I’m here with you. Please tell me more."
-
-        # 2️⃣ Generate soft intake question if needed
-        intake_question = None
-
-        if incident.completion_percentage < 0.7:
-            next_q = generate_next_question(incident.data)
-
-            if next_q:
-                intake_question = (
-                    "\n\nIf you feel comfortable sharing, "
-                    + next_q.lower()
-                )
-
-        # 3️⃣ Combine response
-        final_reply = ai_reply
-
-        if intake_question:
-            final_reply += intake_question
-
-        # 4️⃣ Save assistant reply
-        db.add(Message(
-            conversation_id=id,
-            role="assistant",
-            content=final_reply
-        ))
-        db.commit()
-
-        yield f"data: {json.dumps({'content': final_reply, 'done': True})}\n\n"
+        sse = generation.sse()
+        saved = False
+
+        async def save_partial():
+            # Keep what the user already saw, plus extraction if it finished
+            if saved or not sse.text.strip():
+                return
+            if extraction.done() and not extraction.cancelled() and extraction.exception() is None:
+                state.merge(extraction.result(), message_id=user_message.id)
+            message = await uow.finish(sse.text.strip(), state)
+            await idempotency.finished(message.id)
+
+        # The reply can outlive this request (a client may resume it),
+        # so it is saved on a session of its own
+        async with AsyncSessionLocal() as reply_db:
+            uow.bind(reply_db)
+            try:
+                async with DisconnectWatch(generation) as watch:
+                    watch.link(extraction)
+                    watch.link(text_emotion)
+
+                    # 1️⃣ ALWAYS generate normal AI reply
+                    ai_prompt = prompt_engine.render_chat(
+                        mode["template"],
+                        "stream_reply",
+                        text_emotion=await watch.run(text_emotion),
+                        voice_emotion="none (text message)",
+                        history=context.render(),
+                        user_text=user_text,
+                    )
+
+                    # Relay tokens to the client as llama.cpp produces them;
+                    # once nobody follows the reply the upstream request is closed
+                    tokens = watch.relay(
+                        stream_ai_response(ai_prompt, session=id),
+                        budget=DEFAULT_MAX_TOKENS,
+                    )
+                    async for frame in sse.relay(tokens):
+                        yield frame
+
+                    ai_reply = sse.text.strip()
+
+                    if not ai_reply:
+                        ai_reply = "I’m here with you. Please tell me more."
+                        yield sse.content(ai_reply)
+
+                    # 2️⃣ Apply extracted entities once extraction finishes
+                    state.merge(await watch.run(extraction), message_id=user_message.id)
+
+                    # 3️⃣ Generate soft intake question if needed
+                    intake_question = None
+
+                    if state.completion < 0.7:
+                        next_q = generate_next_question(state)
+
+                        if next_q:
+                            intake_question = (
+                                "\n\nIf you feel comfortable sharing, "
+                                + next_q.lower()
+                            )
+
+                    # 4️⃣ Combine response
+                    final_reply = ai_reply
+
+                    if intake_question:
+                        final_reply += intake_question
+                        yield sse.content(intake_question)
+
+                    # 5️⃣ Save incident changes + assistant reply once the stream has finished
+                    saved = True
+                    message = await uow.finish(final_reply, state)
+                    await idempotency.finished(message.id)
+
+                    yield sse.done()
+
+            except ClientDisconnected:
+                # The client left and didn't resume within the grace period
+                await save_partial()
+
+            except asyncio.CancelledError:
+                # Shutting down mid-reply
+                await save_partial()
+                raise
+
+            finally:
+                # No assistant message saved: a retry starts over
+                await idempotency.abandon()
+
+    generation.start(stream())
 
     return StreamingResponse(
-        stream(),
+        generation.follow(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
+        headers=SSE_HEADERS,
     )
 
 # =========================
 # DELETE CONVERSATION
 # =========================
 @router.delete("/{id}")
-def delete_conversation(
+async def delete_conversation(
     id: str,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user=Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    conversation = (
-        db.query(Conversation)
-        .filter(
+    conversation = await db.scalar(
+        select(Conversation)
+        .where(
             Conversation.id == id,
             Conversation.user_id == user.id
         )
-        .first()
     )
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    db.delete(conversation)
-    db.commit()
+    await db.delete(conversation)
+    await db.commit()
 
     return {"success": True}
\ No newline at end of file
@@ -1,25 +1,60 @@
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.core.config import settings
 from app.models.user import User
+from app.services.idempotency import Idempotency
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+def _user_id(token: str):
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-        user_id = payload.get("sub")
+        return payload.get("sub")
     except JWTError:
         raise HTTPException(401, "Invalid token")
 
-    user = db.get(User, user_id)
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    user = db.get(User, _user_id(token))
     if not user:
         raise HTTPException(401, "User not found")
 
     return user
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Same as get_current_user, on the request's async session
+    """
+    user = await db.get(User, _user_id(token))
+    if not user:
+        raise HTTPException(401, "User not found")
+
+    return user
+
+
+async def get_idempotency(
+    request: Request,
+    user=Depends(get_current_user_async),
+):
+    """
+    The request's Idempotency-Key, scoped to the user and endpoint.
+    The key is released again if the endpoint fails before it streams.
+    """
+    idempotency = Idempotency(
+        request.headers.get("idempotency-key"),
+        scope=f"{user.id}:{request.url.path}",
+    )
+    try:
+        yield idempotency
+    except BaseException:
+        await idempotency.release()
+        raise
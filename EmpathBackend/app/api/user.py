@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.api.deps import get_current_user
-from app.core.database import get_db
+from app.api.deps import get_current_user, get_current_user_async
+from app.core.database import get_db, AsyncSessionLocal
 from app.models.conversation import Conversation
 from app.models.message import Message
+from app.schemas.conversation import conversation_out, message_out
 from datetime import datetime
+import json
+import zlib
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 500
 
 router = APIRouter(prefix="/user", tags=["User"])
 
@@ -18,12 +26,121 @@ def delete_account(user=Depends(get_current_user), db: Session = Depends(get_db)
     db.commit()
     return {"success": True}
 
+def export_queries(user_id):
+    conversations = (
+        select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+        )
+        .where(Conversation.user_id == user_id)
+        .order_by(Conversation.created_at, Conversation.id)
+    )
+    messages = (
+        select(
+            Message.id,
+            Message.conversation_id,
+            Message.role,
+            Message.content,
+            Message.created_at,
+        )
+        .join(Conversation, Message.conversation_id == Conversation.id)
+        .where(Conversation.user_id == user_id)
+        .order_by(Message.conversation_id, Message.created_at, Message.id)
+    )
+    return [
+        ("conversations", conversation_out, conversations),
+        ("messages", message_out, messages),
+    ]
+
+
+async def section_batches(db, serialize, query):
+    """
+    Serialized rows of `query`, EXPORT_BATCH_SIZE at a time from a
+    server-side cursor, so memory stays flat however long the history is.
+    """
+    result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for rows in result.partitions():
+        yield [serialize(row) for row in rows]
+
+
+async def ndjson_export(user_id, exported_at: str):
+    """
+    One JSON object per line, tagged with its type; header line first.
+    """
+    yield json.dumps({"type": "export", "exportedAt": exported_at}) + "\n"
+
+    # A dedicated session: the cursor stays open for the whole response
+    async with AsyncSessionLocal() as db:
+        for section, serialize, query in export_queries(user_id):
+            kind = section[:-1]     # conversations -> conversation
+            async for records in section_batches(db, serialize, query):
+                yield "".join(
+                    json.dumps({"type": kind, **record}) + "\n" for record in records
+                )
+
+
+async def json_export(user_id, exported_at: str):
+    """
+    The original {"exportedAt": ..., "conversations": [...], "messages": [...]}
+    document, written out incrementally.
+    """
+    yield "{" + f'"exportedAt": {json.dumps(exported_at)}'
+
+    async with AsyncSessionLocal() as db:
+        for section, serialize, query in export_queries(user_id):
+            yield f', "{section}": ['
+            separator = ""
+            async for records in section_batches(db, serialize, query):
+                yield separator + ", ".join(json.dumps(record) for record in records)
+                separator = ", "
+            yield "]"
+
+    yield "}"
+
+
+async def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)   # gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def encode_stream(chunks):
+    async for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+
 @router.get("/export")
-def export_data(user=Depends(get_current_user), db: Session = Depends(get_db)):
-    conversations = db.query(Conversation).filter_by(user_id=user.id).all()
-    messages = db.query(Message).join(Conversation).filter(Conversation.user_id == user.id).all()
-    return {
-        "conversations": conversations,
-        "messages": messages,
-        "exportedAt": datetime.utcnow()
-    }
+async def export_data(
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    compress: bool = Query(False, description="gzip the export"),
+    user=Depends(get_current_user_async),
+):
+    """
+    Streams the user's data. `json` (default) keeps the single-document
+    shape the settings page expects; `ndjson` writes one object per line.
+    """
+    exported_at = datetime.utcnow().isoformat()
+    filename = f"empathai-export-{exported_at[:10]}.{format}"
+
+    if format == "ndjson":
+        records, media_type = ndjson_export(user.id, exported_at), "application/x-ndjson"
+    else:
+        records, media_type = json_export(user.id, exported_at), "application/json"
+
+    if compress:
+        return StreamingResponse(
+            gzip_stream(records),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'},
+        )
+
+    return StreamingResponse(
+        encode_stream(records),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -5,7 +5,132 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     OPENROUTER_API_KEY: str | None = None
 
+    # ===== Database pool =====
+    # The async engine uses ASYNC_DATABASE_URL, or DATABASE_URL with an
+    # async driver (postgresql:// -> postgresql+asyncpg://)
+    ASYNC_DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 300
+
+    # ===== LLM (llama.cpp server) =====
+    LLAMA_URL: str = "http://localhost:8081/completion"
+    # Comma-separated /completion URLs of all replicas (defaults to LLAMA_URL)
+    LLAMA_URLS: str = ""
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 120.0
+    LLM_MAX_CONNECTIONS: int = 16
+    LLM_MAX_KEEPALIVE: int = 8
+    LLM_MAX_CONCURRENCY: int = 4
+
+    # Slots on the llama.cpp server (its --parallel). Conversations are
+    # pinned to a slot so their prompt prefix stays in its KV cache.
+    # Off (0) by default: it must not exceed the server's slot count,
+    # which health checks also read from /props and cap it to.
+    LLM_SLOTS: int = 0
+
+    # Backend pool: a replica's circuit opens after LLM_BREAKER_THRESHOLD
+    # consecutive failures for LLM_BREAKER_COOLDOWN seconds; GET /health
+    # is polled every LLM_HEALTH_INTERVAL seconds (0 = off)
+    LLM_BREAKER_THRESHOLD: int = 3
+    LLM_BREAKER_COOLDOWN: float = 30.0
+    LLM_HEALTH_INTERVAL: float = 10.0
+
+    # Completion cache: in-process LRU plus optional SQLite file.
+    # Only temperature-0 calls are cached unless a caller opts in.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL: int = 24 * 3600
+    LLM_CACHE_DB_PATH: str | None = None
+    LLM_CACHE_DB_MAX_ENTRIES: int = 100_000
+
+    # Identical deterministic model calls in flight at the same time
+    # (temperature-0 completions, TER, SER, ASR) share one computation
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # "parallel" runs entity extraction alongside reply generation,
+    # "sequential" waits for it first (the reply prompt then sees it)
+    EXTRACTION_MODE: str = "parallel"
+
+    # How often a streaming reply checks whether the client is still
+    # connected; on disconnect the generation is cancelled
+    DISCONNECT_POLL_INTERVAL: float = 0.5
+
+    # SSE replies: model tokens are sent in frames of up to
+    # SSE_COALESCE_CHARS characters, at least every SSE_COALESCE_MS;
+    # a heartbeat comment goes out after SSE_HEARTBEAT_SECONDS of silence
+    SSE_COALESCE_CHARS: int = 48
+    SSE_COALESCE_MS: float = 50.0
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+
+    # Resumable replies: recent generations' frames are buffered
+    # in-process, or in Redis at STREAM_BUFFER_URL so a client can
+    # resume on any worker. A reply keeps generating for
+    # STREAM_RESUME_GRACE seconds after its client disconnects.
+    STREAM_BUFFER_URL: str | None = None
+    STREAM_BUFFER_GENERATIONS: int = 1024
+    STREAM_BUFFER_FRAMES: int = 512
+    STREAM_BUFFER_TTL: int = 300
+    STREAM_RESUME_GRACE: float = 10.0
+
+    # Idempotency-Key on the message endpoints: keys live for
+    # IDEMPOTENCY_TTL seconds (in Redis too when STREAM_BUFFER_URL is
+    # set); a duplicate waits up to IDEMPOTENCY_WAIT seconds for the
+    # original to start streaming
+    IDEMPOTENCY_TTL: int = 24 * 3600
+    IDEMPOTENCY_MAX_KEYS: int = 10_000
+    IDEMPOTENCY_WAIT: float = 120.0
+
+    # Conversation history in prompts: recent turns verbatim within
+    # CONTEXT_TOKEN_BUDGET, older turns folded into a rolling summary
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_FETCH_MESSAGES: int = 40
+    CONTEXT_SUMMARY_TOKENS: int = 256
+    CONTEXT_SUMMARY_CACHE_SIZE: int = 2048
+
+    # Prompt templates (defaults to the bundled incident_assistant/prompts);
+    # hot reload recompiles a template when its file changes
+    PROMPTS_DIR: str | None = None
+    PROMPTS_HOT_RELOAD: bool = False
+
+    # Safety keyword sets (defaults to the bundled safety/data/keywords_v1.json)
+    SAFETY_KEYWORDS_FILE: str | None = None
+
+    # ===== Local model inference (Whisper / HuBERT / RoBERTa) =====
+    INFERENCE_WORKERS: int = 2
+    INFERENCE_QUEUE_SIZE: int = 8
+    INFERENCE_TORCH_THREADS: int = 0    # 0 = split cores across workers
+    INFERENCE_RETRY_AFTER: int = 5
+
+    # Micro-batching for the text emotion (TER) model
+    TER_MAX_BATCH: int = 16
+    TER_BATCH_WAIT_MS: float = 5.0
+
+    # Dynamic batching for the speech emotion (SER) model; clips are
+    # only batched with others in the same SER_BUCKET_SECONDS length band
+    SER_MAX_BATCH: int = 8
+    SER_BATCH_WAIT_MS: float = 20.0
+    SER_BUCKET_SECONDS: float = 2.0
+
+    # ===== Model loading =====
+    # Models load lazily on first use; list any to load in the background
+    # at startup (e.g. "whisper,ser,ter") for GET /ready to wait on
+    WHISPER_MODEL: str = "small"
+    TER_MODEL_DIR: str = "D:/pendrive_empath/empathai_ter_model"
+    SER_MODEL_DIR: str = "D:/pendrive_empath/empathai_ser_model_hubert"
+    WARM_MODELS: str = ""
+
+    # Emotion classifier runtime: "torch" (fp32), "onnx" (fp32) or
+    # "onnx-int8"; export with `python -m app.llm.onnx_backend`
+    EMOTION_BACKEND: str = "torch"
+    ONNX_DIR: str = "onnx_models"
+
     class Config:
         env_file = ".env"
 
+    def llama_urls(self) -> list[str]:
+        urls = [u.strip() for u in self.LLAMA_URLS.split(",") if u.strip()]
+        return urls or [self.LLAMA_URL]
+
 settings = Settings()
@@ -1,13 +1,16 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.core.config import settings
 
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,     # 🔥 detects dead connections
-    pool_recycle=300,       # 🔥 refresh every 5 min
-    pool_size=5,
-    max_overflow=10,
+    pool_recycle=settings.DB_POOL_RECYCLE,       # 🔥 refresh every 5 min
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
 )
 
 SessionLocal = sessionmaker(
@@ -16,6 +19,33 @@ SessionLocal = sessionmaker(
     autocommit=False
 )
 
+
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+# Async engine for the chat / voice paths, so queries don't block the event loop
+async_engine = create_async_engine(
+    async_database_url(),
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,     # no lazy refresh after commit (not allowed in async)
+)
+
 class Base(DeclarativeBase):
     pass
 
@@ -25,3 +55,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
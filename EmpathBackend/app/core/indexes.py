@@ -0,0 +1,26 @@
+from sqlalchemy import Index
+
+from app.models import Conversation, Message
+
+# Composite indexes backing keyset pagination of the chat history.
+# The trailing id matches the (timestamp, id) tie-break in the ORDER BY,
+# so a page is one index range scan however long the history is.
+PAGINATION_INDEXES = [
+    Index(
+        "ix_messages_conversation_created",
+        Message.conversation_id, Message.created_at, Message.id,
+    ),
+    Index(
+        "ix_conversations_user_updated",
+        Conversation.user_id, Conversation.updated_at, Conversation.id,
+    ),
+]
+
+
+def ensure_indexes(engine):
+    """
+    create_all() only adds indexes with new tables, so create any
+    that are missing on existing databases too.
+    """
+    for index in PAGINATION_INDEXES:
+        index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,75 @@
+import threading
+from collections import deque
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self):
+        return self._value
+
+
+class Histogram:
+    """
+    Keeps the most recent observations so percentiles reflect current load.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._values = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._values.append(value)
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            values = sorted(self._values)
+            count, total = self._count, self._sum
+
+        if not values:
+            return {"count": count, "sum": total}
+
+        def pct(p):
+            return round(values[min(len(values) - 1, int(p * len(values)))], 4)
+
+        return {
+            "count": count,
+            "sum": round(total, 4),
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": round(values[-1], 4),
+        }
+
+
+_counters: dict[str, Counter] = {}
+_histograms: dict[str, Histogram] = {}
+_lock = threading.Lock()
+
+
+def counter(name: str) -> Counter:
+    with _lock:
+        return _counters.setdefault(name, Counter())
+
+
+def histogram(name: str) -> Histogram:
+    with _lock:
+        return _histograms.setdefault(name, Histogram())
+
+
+def snapshot() -> dict:
+    return {
+        "counters": {k: c.snapshot() for k, c in _counters.items()},
+        "histograms": {k: h.snapshot() for k, h in _histograms.items()},
+    }
@@ -0,0 +1,81 @@
+import asyncio
+
+from app.llm.inference import inference_executor
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item model calls into one forward pass.
+
+    Requests are collected for up to `max_wait_ms` (or until `max_batch`
+    arrive), then `batch_fn(items) -> results` runs once on the inference
+    executor and each caller gets its own result back.
+
+    With `bucket_fn`, only items mapping to the same bucket share a batch,
+    e.g. audio clips of similar length so little compute goes to padding.
+    """
+
+    def __init__(
+        self,
+        batch_fn,
+        *,
+        max_batch: int,
+        max_wait_ms: float,
+        bucket_fn=None,
+        executor=inference_executor,
+    ):
+        self._batch_fn = batch_fn
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000
+        self._bucket_fn = bucket_fn or (lambda item: None)
+        self._executor = executor
+        self._pending: dict[object, list[tuple[object, asyncio.Future]]] = {}
+        self._timers: dict[object, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        key = self._bucket_fn(item)
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future))
+
+        if len(pending) >= self._max_batch:
+            self._dispatch(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self._max_wait, self._dispatch, key)
+
+        return await future
+
+    def _dispatch(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        pending = self._pending.pop(key, [])
+
+        while pending:
+            batch, pending = pending[:self._max_batch], pending[self._max_batch:]
+
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        # Skip callers that gave up while waiting for the batch window
+        batch = [(item, f) for item, f in batch if not f.done()]
+        if not batch:
+            return
+
+        try:
+            results = await self._executor.run(self._batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
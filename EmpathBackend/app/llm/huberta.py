@@ -1,55 +1,196 @@
-import torch
-import librosa
 import os
-from transformers import AutoFeatureExtractor, HubertForSequenceClassification
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.config import settings
+from app.llm.batching import MicroBatcher
+from app.llm.onnx_backend import load_session
+from app.llm.registry import registry
+from app.llm.single_flight import SingleFlight, audio_key
 
 # ================= CONFIG =================
-MODEL_DIR = "D:/pendrive_empath/empathai_ser_model_hubert"
 TARGET_SR = 16000
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".webm", ".m4a")
 # ==========================================
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# ===== LOAD ONCE =====
-print("🔹 Loading SER feature extractor...")
-feature_extractor = AutoFeatureExtractor.from_pretrained(MODEL_DIR)
+def load():
+    """
+    Load the SER feature extractor/model from settings.SER_MODEL_DIR.
+    Called once by the model registry, on first use or warm-up.
+    """
+    import torch
+    from transformers import AutoFeatureExtractor, HubertForSequenceClassification
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    print("🔹 Loading SER feature extractor...")
+    feature_extractor = AutoFeatureExtractor.from_pretrained(settings.SER_MODEL_DIR)
 
-print("🔹 Loading SER model...")
-model = HubertForSequenceClassification.from_pretrained(MODEL_DIR)
-model.to(device)
-model.eval()
+    print("🔹 Loading SER model...")
+    model = HubertForSequenceClassification.from_pretrained(settings.SER_MODEL_DIR)
+    model.to(device)
+    model.eval()
 
-print(f"✅ SER model loaded on {device}")
+    print(f"✅ SER model loaded on {device}")
+
+    return SimpleNamespace(
+        feature_extractor=feature_extractor,
+        model=model,
+        device=device,
+        # None unless EMOTION_BACKEND selects an ONNX model
+        ort_session=load_session("ser"),
+    )
 
 
-def predict_speech_emotion(audio_path: str) -> str:
+registry.register("ser", load)
+
+
+def load_speech(audio: str | np.ndarray) -> np.ndarray | None:
     """
-    Predict emotion from English speech audio.
+    Return mono float32 samples at TARGET_SR, loading from disk for paths.
     """
-    if not os.path.exists(audio_path):
-        return "audio_not_found"
+    if isinstance(audio, np.ndarray):
+        return audio
 
-    speech, _ = librosa.load(audio_path, sr=TARGET_SR, mono=True)
+    if not os.path.exists(audio):
+        return None
+
+    import librosa
+
+    speech, _ = librosa.load(audio, sr=TARGET_SR, mono=True)
+    return speech
 
-    if speech is None or len(speech) == 0:
-        return "empty_audio"
 
-    inputs = feature_extractor(
-        [speech],
+def extract_features(clips: list[np.ndarray]):
+    return registry.get("ser").feature_extractor(
+        clips,
         sampling_rate=TARGET_SR,
         padding=True,
         return_attention_mask=True,
         return_tensors="pt"
     )
 
-    input_values = inputs.input_values.to(device)
-    attention_mask = inputs.attention_mask.to(device)
+
+def torch_logits(inputs) -> np.ndarray:
+    import torch
+
+    ser = registry.get("ser")
+    input_values = inputs.input_values.to(ser.device)
+    attention_mask = inputs.attention_mask.to(ser.device)
 
     with torch.no_grad():
-        logits = model(
+        return ser.model(
             input_values=input_values,
             attention_mask=attention_mask
-        ).logits
+        ).logits.cpu().numpy()
+
+
+def onnx_logits(session, inputs) -> np.ndarray:
+    return session.run(None, {
+        "input_values": inputs.input_values.numpy(),
+        "attention_mask": inputs.attention_mask.numpy(),
+    })[0]
+
+
+def logits(inputs) -> np.ndarray:
+    ort_session = registry.get("ser").ort_session
+    if ort_session is not None:
+        return onnx_logits(ort_session, inputs)
+    return torch_logits(inputs)
+
+
+def predict_speech_emotions_batch(clips: list[np.ndarray]) -> list[str]:
+    """
+    Predict emotions for several clips in one padded forward pass.
+    Works best when clips have similar lengths (see length_bucket).
+    """
+    results = ["empty_audio"] * len(clips)
+    idx = [i for i, clip in enumerate(clips) if clip is not None and len(clip) > 0]
+
+    if not idx:
+        return results
+
+    predicted = logits(extract_features([clips[i] for i in idx])).argmax(axis=-1)
+
+    for i, predicted_id in zip(idx, predicted.tolist()):
+        results[i] = registry.get("ser").model.config.id2label[predicted_id]
+
+    return results
+
+
+def predict_speech_emotion(audio: str | np.ndarray) -> str:
+    """
+    Predict emotion from English speech audio.
+
+    Accepts a file path or mono float32 samples already at TARGET_SR,
+    e.g. the buffer decoded once for Whisper.
+    """
+    speech = load_speech(audio)
+    if speech is None:
+        return "audio_not_found"
+
+    return predict_speech_emotions_batch([speech])[0]
+
+
+def length_bucket(speech: np.ndarray) -> int:
+    return int(len(speech) / (TARGET_SR * settings.SER_BUCKET_SECONDS))
+
+
+# Concurrent clips of similar length share one forward pass
+batcher = MicroBatcher(
+    predict_speech_emotions_batch,
+    max_batch=settings.SER_MAX_BATCH,
+    max_wait_ms=settings.SER_BATCH_WAIT_MS,
+    bucket_fn=length_bucket,
+)
+
+# ... and the same clip in flight twice is only predicted once
+flight = SingleFlight("ser")
+
+
+async def predict_speech_emotion_async(speech: np.ndarray) -> str:
+    """
+    Predict emotion for 16 kHz float32 samples via the batching engine.
+    """
+    if len(speech) == 0:
+        return "empty_audio"
+
+    return await flight.run(audio_key(speech), batcher.submit, speech)
+
+
+def probe_duration(path: str) -> float:
+    """
+    Clip length in seconds from the file header, without decoding it.
+    Falls back to a size-based estimate (~128 kbps) for formats
+    soundfile can't read.
+    """
+    import soundfile
+
+    try:
+        return soundfile.info(path).duration
+    except Exception:
+        return os.path.getsize(path) / 16000
+
+
+def predict_speech_emotions_dir(directory: str, batch_size: int = 8) -> dict:
+    """
+    Score every recording in a directory, returning {filename: emotion}.
+    Clips are sorted by length first so each batch pads very little, and
+    only one batch of clips is decoded into memory at a time.
+    """
+    paths = {
+        name: os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    }
+    ordered = sorted(paths, key=lambda name: (probe_duration(paths[name]), name))
+
+    results = {}
+    for start in range(0, len(ordered), batch_size):
+        chunk = ordered[start:start + batch_size]
+        clips = [load_speech(paths[name]) for name in chunk]
+        results.update(zip(chunk, predict_speech_emotions_batch(clips)))
 
-    predicted_id = torch.argmax(logits, dim=-1).item()
-    return model.config.id2label[predicted_id]
+    return results
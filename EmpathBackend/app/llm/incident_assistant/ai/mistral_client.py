@@ -1,16 +1,14 @@
-import requests
+from app.services.llm_cache import cached_completion
 
-LLAMA_URL = "http://localhost:8081/completion"
 
-def call_mistral(prompt: str, temperature=0.7, max_tokens=256) -> str:
+async def call_mistral(prompt: str, temperature=0.7, max_tokens=256, cache=None) -> str:
     payload = {
         "prompt": prompt,
         "temperature": temperature,
         "n_predict": max_tokens,
         "top_p": 0.9,
+        "cache_prompt": True,
     }
 
-    response = requests.post(LLAMA_URL, json=payload, timeout=120)
-    response.raise_for_status()
-
-    return response.json()["content"].strip()
+    content = await cached_completion(payload, cache)
+    return content.strip()
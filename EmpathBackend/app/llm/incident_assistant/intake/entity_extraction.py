@@ -1,4 +1,5 @@
 from app.services.ai_service import call_mistral
+from app.llm.incident_assistant.prompt_engine import prompt_engine
 import json
 
 ENTITY_KEYS = [
@@ -20,26 +21,15 @@ ENTITY_KEYS = [
     "ongoing",
 ]
 
-def extract_entities(message: str, current_state: dict | None = None) -> dict:
-    prompt = f"""
-You are an information extraction system.
-
-RULES:
-- Return ONLY valid JSON
-- Do NOT guess
-- Omit missing fields
-
-ALLOWED KEYS:
-{ENTITY_KEYS}
-
-MESSAGE:
-"{message}"
-
-OUTPUT JSON ONLY:
-"""
+async def extract_entities(message: str, current_state: dict | None = None) -> dict:
+    prompt = prompt_engine.render(
+        "entity_extraction",
+        allowed_keys=ENTITY_KEYS,
+        message=message,
+    )
 
     try:
-        raw = call_mistral(prompt, temperature=0.0)
+        raw = await call_mistral(prompt, temperature=0.0)
 
         raw = raw.replace("```json", "").replace("```", "").strip()
         data = json.loads(raw)
@@ -5,18 +5,26 @@ from app.llm.incident_assistant.responses.empathy import empathetic_response
 from app.llm.incident_assistant.responses.pocso import pocso_message
 from app.llm.incident_assistant.responses.high_risk import high_risk_message
 from app.llm.incident_assistant.safety.router import route_request
-def run_incident_assistant(
+from app.services.context_builder import ConversationContext, fit_window
+from app.core.config import settings
+
+
+async def run_incident_assistant(
     user_text: str,
     history: list,
     user_age: int | None,
     emotions: dict,
     incident_state: dict
 ):
+    """
+    `history` is the earlier turns, oldest first, as
+    {"role": "user" | "assistant", "content": ...} dicts.
+    """
     # 1️⃣ Decide safety mode
     mode = route_request(user_text, user_age)
 
     # 2️⃣ Always extract factual entities
-    entities = extract_entities(user_text)
+    entities = await extract_entities(user_text)
     incident_state.update(entities)
 
     # 3️⃣ HIGH RISK MODE (murder, extreme violence)
@@ -36,8 +44,12 @@ def run_incident_assistant(
             return question, mode
 
     if mode.get("allow_empathy", False):
+        # Most recent turns that fit the context budget
+        _, window, _ = fit_window(history or [], settings.CONTEXT_TOKEN_BUDGET)
         return (
-            empathetic_response(user_text, summary),
+            await empathetic_response(
+                user_text, summary, ConversationContext(turns=window).render()
+            ),
             mode
         )
 
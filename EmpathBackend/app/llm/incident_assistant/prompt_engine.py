@@ -0,0 +1,124 @@
+import os
+import re
+import string
+import threading
+
+from app.core.config import settings
+from app.core import metrics
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "prompts")
+
+SHARED_PREFIX = metrics.histogram("llm_prompt_shared_prefix_ratio")
+
+_formatter = string.Formatter()
+_blank_lines = re.compile(r"\n{3,}")
+
+
+class PromptTemplate:
+    """
+    A prompt file split once into literal text and {placeholders}, so
+    rendering is a single join with no parsing.
+
+    `static_prefix` is the literal text before the first placeholder:
+    the part that is byte-identical in every render and that llama.cpp
+    can serve from its KV cache (cache_prompt) instead of re-evaluating.
+    """
+
+    __slots__ = ("name", "path", "mtime", "segments", "fields", "static_prefix")
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+
+        self.segments = [(literal, field) for literal, field, _, _ in _formatter.parse(source)]
+        self.fields = tuple(field for _, field in self.segments if field is not None)
+
+        prefix = []
+        for literal, field in self.segments:
+            prefix.append(literal)
+            if field is not None:
+                break
+        self.static_prefix = "".join(prefix)
+
+    def render(self, values: dict) -> str:
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field is not None:
+                value = values.get(field)
+                parts.append("" if value is None else str(value))
+
+        # Empty optional sections (e.g. no history yet) leave blank runs
+        return _blank_lines.sub("\n\n", "".join(parts)).strip()
+
+
+class PromptEngine:
+    """
+    Compiles every prompts/*.txt once at startup. With `hot_reload` a
+    template is recompiled when its file changes (one stat per render),
+    which is handy while tuning prompts.
+
+    Chat prompts are a risk-mode system template (normal / pocso /
+    high_risk) followed by a task template, with the system part's
+    static text first so it stays a shared, cacheable prefix.
+    """
+
+    def __init__(self, directory: str, hot_reload: bool = False):
+        self._dir = directory
+        self._hot_reload = hot_reload
+        self._templates: dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".txt"):
+                name = filename[:-4]
+                self._templates[name] = PromptTemplate(name, os.path.join(directory, filename))
+
+    def get(self, name: str) -> PromptTemplate:
+        template = self._templates.get(name)
+        if template is None:
+            raise KeyError(f"Unknown prompt template {name!r} in {self._dir}")
+
+        if self._hot_reload and os.path.getmtime(template.path) != template.mtime:
+            with self._lock:
+                template = PromptTemplate(name, template.path)
+                self._templates[name] = template
+                print(f"🔄 Reloaded prompt template {name}")
+
+        return template
+
+    def render(self, name: str, /, **values) -> str:
+        return self.get(name).render(values)
+
+    def render_chat(self, system: str, task: str, /, **values) -> str:
+        """
+        System prompt for the risk mode, then the task prompt.
+        """
+        system_template = self.get(system)
+        prompt = system_template.render(values) + "\n\n" + self.get(task).render(values)
+
+        SHARED_PREFIX.observe(len(self.shared_prefix(system, task)) / max(len(prompt), 1))
+        return prompt
+
+    def shared_prefix(self, system: str, task: str | None = None) -> str:
+        """
+        Text every render_chat(system, task) prompt starts with.
+        """
+        system_template = self.get(system)
+        if system_template.fields or task is None:
+            return system_template.static_prefix.strip()
+
+        return system_template.static_prefix.strip() + "\n\n" + self.get(task).static_prefix
+
+    def names(self) -> list[str]:
+        return list(self._templates)
+
+
+prompt_engine = PromptEngine(
+    settings.PROMPTS_DIR or PROMPTS_DIR,
+    hot_reload=settings.PROMPTS_HOT_RELOAD,
+)
@@ -1,19 +1,12 @@
 from app.services.ai_service import call_mistral
 # or: from incident_assistant.ai.mistral_client import call_mistral
-
-def empathetic_response(user_text: str, incident_summary: str) -> str:
-    prompt = f"""
-You are a compassionate counselor.
-
-Context:
-{incident_summary}
-
-User message:
-"{user_text}"
-
-Instructions:
-- Respond with empathy
-- Validate feelings
-- Ask at most one gentle question
-"""
-    return call_mistral(prompt)
+from app.llm.incident_assistant.prompt_engine import prompt_engine
+
+async def empathetic_response(user_text: str, incident_summary: str, history: str = "") -> str:
+    prompt = prompt_engine.render(
+        "empathy",
+        incident_summary=incident_summary,
+        history=history,
+        user_text=user_text,
+    )
+    return await call_mistral(prompt)
@@ -1,23 +1,11 @@
-def detect_murder_confession(text: str) -> bool:
-    keywords = [
-        "i killed", "i murdered", "i stabbed",
-        "i shot", "i strangled", "i buried the body"
-    ]
-    text = text.lower()
-
-    result = any(k in text for k in keywords)
+from .router import safety_engine
 
-    print("MURDER DETECTION:", text, "=>", result)
 
-    return result
+def detect_murder_confession(text: str) -> bool:
+    return "murder_confession" in safety_engine.scan(text)
 
 def detect_minor_sexual_abuse(text: str, user_age: int | None) -> bool:
     if user_age is None or user_age >= 18:
         return False
 
-    abuse_terms = [
-        "molested", "touched me", "rape",
-        "sexual abuse", "forced me", "uncle touched"
-    ]
-    text = text.lower()
-    return any(t in text for t in abuse_terms)
+    return "minor_sexual_abuse" in safety_engine.scan(text)
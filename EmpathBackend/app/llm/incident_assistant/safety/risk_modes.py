@@ -1,7 +1,14 @@
+import os
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts")
+
+# "prompt" is the mode's system prompt file, "template" its prompt_engine name
+
 def normal_mode():
     return {
         "mode": "NORMAL",
-        "prompt": "app/llm/prompts/normal.txt",
+        "prompt": os.path.join(PROMPTS_DIR, "normal.txt"),
+        "template": "normal",
         "allow_questions": True,
         "allow_empathy": True
     }
@@ -9,7 +16,8 @@ def normal_mode():
 def pocso_mode():
     return {
         "mode": "POCSO",
-        "prompt": "app/llm/prompts/pocso.txt",
+        "prompt": os.path.join(PROMPTS_DIR, "pocso.txt"),
+        "template": "pocso",
         "allow_questions": False,
         "allow_empathy": False
     }
@@ -17,7 +25,8 @@ def pocso_mode():
 def high_risk_mode():
     return {
         "mode": "HIGH_RISK",
-        "prompt": "app/llm/prompts/high_risk.txt",
+        "prompt": os.path.join(PROMPTS_DIR, "high_risk.txt"),
+        "template": "high_risk",
         "allow_questions": False,
         "allow_empathy": False
     }
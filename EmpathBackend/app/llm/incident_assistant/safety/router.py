@@ -1,16 +1,148 @@
-from .intent_detection import (
-    detect_murder_confession,
-    detect_minor_sexual_abuse
-)
+import json
+import os
+import re
+import string
+import unicodedata
+
+from app.core.config import settings
 from .risk_modes import normal_mode, pocso_mode, high_risk_mode
 
+KEYWORDS_FILE = os.path.join(os.path.dirname(__file__), "data", "keywords_v1.json")
+
+# ASCII punctuation splits words, so "me." and "me" match alike
+_ASCII_PUNCT = bytes.maketrans(string.punctuation.encode(), b" " * len(string.punctuation))
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Canonical word list for matching: case-folded, punctuation stripped,
+    and for non-ASCII input NFKC-normalized with zero-width characters
+    removed. Splitting also collapses any run of whitespace.
+    """
+    text = text or ""
+
+    if text.isascii():
+        return text.lower().encode("ascii").translate(_ASCII_PUNCT).decode("ascii").split()
+
+    text = unicodedata.normalize("NFKC", text).translate(_ZERO_WIDTH).casefold()
+    return _NON_WORD.sub(" ", text).split()
+
+
+class SafetyEngine:
+    """
+    Multi-phrase matcher for the safety keyword sets, built once.
+
+    Each phrase is indexed by its longest word (its anchor; "killed" rather
+    than "i"). A message is tokenized once and only anchor positions are
+    checked against full phrases.
+
+    Words match from the start of a word: "rape" does not hit "grape". The
+    last word of a phrase also matches as a prefix when it is at least
+    MIN_STEM characters long, so inflections still count ("raped",
+    "rapes", "sexual abuser"); shorter ones ("me") must match whole.
+    """
+
+    MIN_STEM = 4
+
+    def __init__(self, keyword_sets: dict[str, list[str]], version: int | None = None):
+        self.version = version
+        self.categories = list(keyword_sets)
+
+        # anchor word -> [(phrase words, anchor offset, prefix, category)]
+        self._index: dict[str, list[tuple[tuple[str, ...], int, bool, str]]] = {}
+        for category, keywords in keyword_sets.items():
+            for keyword in keywords:
+                words = tuple(tokenize(keyword))
+                if words:
+                    prefix = len(words[-1]) >= self.MIN_STEM
+                    offset = max(range(len(words)), key=lambda i: len(words[i]))
+                    self._index.setdefault(words[offset], []).append((words, offset, prefix, category))
+
+        # Anchors that may match as a prefix of a longer word
+        stems = {
+            words[offset]
+            for entries in self._index.values()
+            for words, offset, prefix, _ in entries
+            if prefix and offset == len(words) - 1
+        }
+        self._anchors = frozenset(self._index)
+        self._stem_lengths = sorted({len(stem) for stem in stems})
+        self._stems = re.compile(
+            r"(?:^| )(?:" + "|".join(map(re.escape, sorted(stems))) + ")"
+        ) if stems else None
+
+    def _candidates(self, word: str):
+        yield from self._index.get(word, ())
+
+        for n in self._stem_lengths:
+            if n >= len(word):
+                break
+            for entry in self._index.get(word[:n], ()):
+                words, offset, prefix, _ = entry
+                if prefix and offset == len(words) - 1:
+                    yield entry
+
+    @classmethod
+    def from_file(cls, path: str) -> "SafetyEngine":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        version = data.pop("version", None)
+        return cls(data, version=version)
+
+    def scan(self, text: str) -> set[str]:
+        """
+        Categories whose keywords appear in `text`.
+        """
+        words = tokenize(text)
+
+        # Most messages hit nothing: rule them out without a per-word loop
+        if self._anchors.isdisjoint(words) and (
+            self._stems is None or not self._stems.search(" ".join(words))
+        ):
+            return set()
+
+        hits = set()
+        for i, word in enumerate(words):
+            for phrase, offset, prefix, category in self._candidates(word):
+                start = i - offset
+                end = start + len(phrase)
+                if start < 0 or end > len(words):
+                    continue
+
+                last = words[end - 1]
+                if tuple(words[start:end - 1]) == phrase[:-1] and (
+                    last == phrase[-1] or (prefix and last.startswith(phrase[-1]))
+                ):
+                    hits.add(category)
+        return hits
+
+    def scan_batch(self, texts: list[str]) -> list[set[str]]:
+        return [self.scan(text) for text in texts]
+
+    def route(self, user_text: str, user_age: int | None) -> dict:
+        hits = self.scan(user_text)
+
+        if "murder_confession" in hits:
+            return high_risk_mode()
+
+        if "minor_sexual_abuse" in hits and user_age is not None and user_age < 18:
+            return pocso_mode()
+
+        return normal_mode()
+
+    def route_batch(self, texts: list[str], ages: list[int | None]) -> list[dict]:
+        return [self.route(text, age) for text, age in zip(texts, ages)]
+
+
+safety_engine = SafetyEngine.from_file(settings.SAFETY_KEYWORDS_FILE or KEYWORDS_FILE)
+
 
 def route_request(user_text: str, user_age: int | None):
-    print("ROUTER CALLED WITH:", user_text)
-    if detect_murder_confession(user_text):
-        return high_risk_mode()
+    return safety_engine.route(user_text, user_age)
 
-    if detect_minor_sexual_abuse(user_text, user_age):
-        return pocso_mode()
 
-    return normal_mode()
+def route_requests(texts: list[str], ages: list[int | None]) -> list[dict]:
+    return safety_engine.route_batch(texts, ages)
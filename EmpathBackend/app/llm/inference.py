@@ -0,0 +1,95 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core import metrics
+
+
+class InferenceBusy(Exception):
+    """
+    Raised when the inference queue is full; callers should back off.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model calls (Whisper, HuBERT, RoBERTa) off the event loop.
+
+    A small thread pool does the work while torch is limited to a share of
+    the cores per worker, so concurrent jobs don't oversubscribe the CPU.
+    At most `workers + max_queue` jobs are admitted; beyond that `run`
+    raises InferenceBusy instead of letting the backlog grow unbounded.
+    """
+
+    def __init__(self, workers: int, max_queue: int, torch_threads: int, retry_after: int):
+        self._workers = workers
+        self._max_pending = workers + max_queue
+        self._torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self._retry_after = retry_after
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending = 0
+
+        self._queued = metrics.histogram("inference_pending_jobs")
+        self._rejected = metrics.counter("inference_rejected_total")
+        self._cancelled = metrics.counter("inference_cancelled_total")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            import torch
+
+            torch.set_num_threads(self._torch_threads)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix="inference",
+            )
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn, *args):
+        # Only touched from the event loop thread, so a plain counter is safe
+        if self._pending >= self._max_pending:
+            self._rejected.inc()
+            raise InferenceBusy(self._retry_after)
+
+        self._pending += 1
+        self._queued.observe(self._pending)
+
+        loop = asyncio.get_running_loop()
+        job = self._get_executor().submit(fn, *args)
+        try:
+            # Cancelling the caller (e.g. the client disconnected) drops
+            # the job if it hasn't started yet
+            return await asyncio.wrap_future(job)
+        finally:
+            if job.cancelled():
+                self._cancelled.inc()
+
+            if job.done():
+                self._pending -= 1
+            else:
+                # Still running in its thread: it keeps its place until done
+                job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+
+    def _release(self):
+        self._pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+inference_executor = InferenceExecutor(
+    workers=settings.INFERENCE_WORKERS,
+    max_queue=settings.INFERENCE_QUEUE_SIZE,
+    torch_threads=settings.INFERENCE_TORCH_THREADS,
+    retry_after=settings.INFERENCE_RETRY_AFTER,
+)
@@ -0,0 +1,280 @@
+"""
+ONNX Runtime backend for the emotion classifiers.
+
+Export, quantize and check drift against torch with:
+
+    EMOTION_BACKEND=torch python -m app.llm.onnx_backend [--texts FILE] [--audio-dir DIR]
+
+Then pick the backend at runtime with EMOTION_BACKEND = torch | onnx | onnx-int8.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+
+import numpy as np
+
+from app.core.config import settings
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+SAMPLE_TEXTS = [
+    "I feel so scared to go back home tonight.",
+    "Thank you, talking to you really helped.",
+    "He keeps sending me threatening messages and I don't know what to do.",
+    "I'm so angry that nobody believed me.",
+    "I don't know.",
+    "help",
+    "My manager touched me inappropriately at work and I feel disgusted.",
+    "Everything is fine now, I just wanted to say thanks.",
+    "I can't stop crying, I feel completely alone.",
+    "Why would they do this to me? I trusted them.",
+]
+
+
+def model_path(name: str, backend: str) -> str:
+    suffix = ".int8.onnx" if backend == "onnx-int8" else ".onnx"
+    return os.path.join(settings.ONNX_DIR, name + suffix)
+
+
+def create_session(path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if settings.INFERENCE_TORCH_THREADS:
+        options.intra_op_num_threads = settings.INFERENCE_TORCH_THREADS
+
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def load_session(name: str):
+    """
+    Session for model `name` ("ter" / "ser") under EMOTION_BACKEND,
+    or None when the torch backend is selected.
+    """
+    backend = settings.EMOTION_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMOTION_BACKEND {backend!r}, expected one of {BACKENDS}")
+
+    if backend == "torch":
+        return None
+
+    path = model_path(name, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found; run `python -m app.llm.onnx_backend` to export it"
+        )
+
+    print(f"🔹 Loading {name.upper()} ONNX session ({backend})...")
+    return create_session(path)
+
+
+# =========================
+# EXPORT
+# =========================
+
+def _export(module, args: tuple, input_names: list, dynamic_axes: dict, path: str):
+    import torch
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            args,
+            path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={**dynamic_axes, "logits": {0: "batch"}},
+            opset_version=14,
+            do_constant_folding=True,
+        )
+
+
+def export_ter():
+    import torch
+    from app.llm import roberta
+    from app.llm.registry import registry
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    inputs = roberta.tokenize(SAMPLE_TEXTS[:2])
+    path = model_path("ter", "onnx")
+
+    _export(
+        # A CPU copy: the live model stays on its device for the drift check
+        LogitsOnly(copy.deepcopy(registry.get("ter").model).cpu()).eval(),
+        (inputs["input_ids"], inputs["attention_mask"]),
+        ["input_ids", "attention_mask"],
+        {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+        },
+        path,
+    )
+    return path
+
+
+def export_ser():
+    import torch
+    from app.llm import huberta
+    from app.llm.registry import registry
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_values, attention_mask):
+            return self.model(input_values=input_values, attention_mask=attention_mask).logits
+
+    inputs = huberta.extract_features(_synthetic_clips(2))
+    path = model_path("ser", "onnx")
+
+    _export(
+        # A CPU copy: the live model stays on its device for the drift check
+        LogitsOnly(copy.deepcopy(registry.get("ser").model).cpu()).eval(),
+        (inputs["input_values"], inputs["attention_mask"]),
+        ["input_values", "attention_mask"],
+        {
+            "input_values": {0: "batch", 1: "samples"},
+            "attention_mask": {0: "batch", 1: "samples"},
+        },
+        path,
+    )
+    return path
+
+
+def quantize(name: str) -> str:
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    src = model_path(name, "onnx")
+    dst = model_path(name, "onnx-int8")
+
+    quantize_dynamic(
+        src,
+        dst,
+        op_types_to_quantize=["MatMul", "Gemm"],
+        weight_type=QuantType.QInt8,
+    )
+    return dst
+
+
+# =========================
+# DRIFT CHECK
+# =========================
+
+def _synthetic_clips(n: int, seed: int = 0) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return [
+        (0.1 * rng.standard_normal(int(16000 * (1 + i % 4)))).astype(np.float32)
+        for i in range(n)
+    ]
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def drift_ter(texts: list[str]) -> dict:
+    from app.llm import roberta
+
+    inputs = roberta.tokenize(texts)
+    reference = _sigmoid(roberta.torch_logits(inputs))
+    ref_labels = reference > roberta.PREDICTION_THRESHOLD
+
+    report = {}
+    for backend in ("onnx", "onnx-int8"):
+        session = create_session(model_path("ter", backend))
+        probs = _sigmoid(roberta.onnx_logits(session, inputs))
+
+        report[backend] = {
+            "samples": len(texts),
+            "max_abs_diff": float(np.abs(probs - reference).max()),
+            "mean_abs_diff": float(np.abs(probs - reference).mean()),
+            "label_agreement": float(
+                ((probs > roberta.PREDICTION_THRESHOLD) == ref_labels).all(axis=-1).mean()
+            ),
+        }
+    return report
+
+
+def drift_ser(clips: list[np.ndarray]) -> dict:
+    from app.llm import huberta
+
+    # One clip per pass so padding doesn't differ between backends
+    reference = np.concatenate([
+        _softmax(huberta.torch_logits(huberta.extract_features([clip])))
+        for clip in clips
+    ])
+
+    report = {}
+    for backend in ("onnx", "onnx-int8"):
+        session = create_session(model_path("ser", backend))
+        probs = np.concatenate([
+            _softmax(huberta.onnx_logits(session, huberta.extract_features([clip])))
+            for clip in clips
+        ])
+
+        report[backend] = {
+            "samples": len(clips),
+            "max_abs_diff": float(np.abs(probs - reference).max()),
+            "mean_abs_diff": float(np.abs(probs - reference).mean()),
+            "label_agreement": float(
+                (probs.argmax(axis=-1) == reference.argmax(axis=-1)).mean()
+            ),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export emotion models to ONNX and check drift")
+    parser.add_argument("--texts", help="file with one sample text per line")
+    parser.add_argument("--audio-dir", help="directory of sample recordings")
+    parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_args(argv)
+
+    if not args.skip_export:
+        for name, export in (("ter", export_ter), ("ser", export_ser)):
+            print(f"Exporting {name} -> {export()}")
+            print(f"Quantizing {name} -> {quantize(name)}")
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    if args.audio_dir:
+        from app.llm import huberta
+
+        clips = [
+            huberta.load_speech(os.path.join(args.audio_dir, name))
+            for name in sorted(os.listdir(args.audio_dir))
+            if name.lower().endswith(huberta.AUDIO_EXTENSIONS)
+        ]
+    else:
+        clips = _synthetic_clips(8)
+
+    report = {"ter": drift_ter(texts), "ser": drift_ser(clips)}
+    print(json.dumps(report, indent=2))
+
+    worst = min(r["label_agreement"] for model in report.values() for r in model.values())
+    return 0 if worst >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
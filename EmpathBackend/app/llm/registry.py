@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+
+class ModelRegistry:
+    """
+    Loads models on first use (or on background warm-up) instead of at
+    import time, so workers that never touch a model never pay for it.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+
+    def register(self, name: str, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def validate(self, names: list[str]):
+        """
+        Raise if any of `names` has no registered loader (e.g. a typo
+        in WARM_MODELS), instead of waiting on it forever.
+        """
+        unknown = [name for name in names if name not in self._loaders]
+        if unknown:
+            raise ValueError(
+                f"Unknown model(s) {', '.join(unknown)}; "
+                f"registered: {', '.join(sorted(self._loaders))}"
+            )
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"No model registered as {name!r}")
+
+        # Model loads happen on executor threads; load each one only once
+        with self._locks[name]:
+            if name not in self._models:
+                started = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._errors.pop(name, None)
+                self._load_seconds[name] = round(time.perf_counter() - started, 2)
+
+        return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    async def warm_up(self, names: list[str]):
+        for name in names:
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception as e:
+                print(f"⚠️ Warm-up of {name} failed:", e)
+
+    def status(self) -> dict:
+        status = {}
+        for name in self._loaders:
+            if name in self._models:
+                status[name] = {"loaded": True, "load_seconds": self._load_seconds[name]}
+            elif name in self._errors:
+                status[name] = {"loaded": False, "error": self._errors[name]}
+            else:
+                status[name] = {"loaded": False}
+        return status
+
+
+registry = ModelRegistry()
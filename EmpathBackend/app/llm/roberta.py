@@ -1,53 +1,136 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.config import settings
+from app.llm.batching import MicroBatcher
+from app.llm.onnx_backend import load_session
+from app.llm.registry import registry
+from app.llm.single_flight import SingleFlight, text_key
 
 # ================= CONFIG =================
-MODEL_DIR = "D:/pendrive_empath/empathai_ter_model"
 PREDICTION_THRESHOLD = 0.5
+MAX_LENGTH = 128
 # ==========================================
-print("MODEL EXISTS:", os.path.exists(MODEL_DIR))
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# ===== LOAD ONCE (IMPORTANT) =====
-print("🔹 Loading TER tokenizer...")
-tokenizer = AutoTokenizer.from_pretrained(
-    MODEL_DIR,
-    use_fast=False
-)
+def load():
+    """
+    Load the TER tokenizer/model from settings.TER_MODEL_DIR.
+    Called once by the model registry, on first use or warm-up.
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-print("🔹 Loading TER model...")
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-model.to(device)
-model.eval()
+    model_dir = settings.TER_MODEL_DIR
+    print("MODEL EXISTS:", os.path.exists(model_dir))
 
-print(f"✅ TER model loaded on {device}")
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+    print("🔹 Loading TER tokenizer...")
+    tokenizer = AutoTokenizer.from_pretrained(
+        model_dir,
+        use_fast=True
+    )
 
-def predict_emotion(text: str) -> dict:
-    """
-    Predict emotions from English text.
-    """
-    inputs = tokenizer(
-        text,
+    print("🔹 Loading TER model...")
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.to(device)
+    model.eval()
+
+    print(f"✅ TER model loaded on {device}")
+
+    return SimpleNamespace(
+        tokenizer=tokenizer,
+        model=model,
+        device=device,
+        # None unless EMOTION_BACKEND selects an ONNX model
+        ort_session=load_session("ter"),
+    )
+
+
+registry.register("ter", load)
+
+
+def tokenize(texts: list[str]):
+    return registry.get("ter").tokenizer(
+        texts,
         return_tensors="pt",
         truncation=True,
         padding=True,
-        max_length=128
+        max_length=MAX_LENGTH
     )
 
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+
+def torch_logits(inputs) -> np.ndarray:
+    import torch
+
+    ter = registry.get("ter")
+    inputs = {k: v.to(ter.device) for k, v in inputs.items()}
 
     with torch.no_grad():
-        logits = model(**inputs).logits
+        return ter.model(**inputs).logits.cpu().numpy()
+
+
+def onnx_logits(session, inputs) -> np.ndarray:
+    return session.run(None, {
+        "input_ids": inputs["input_ids"].numpy(),
+        "attention_mask": inputs["attention_mask"].numpy(),
+    })[0]
 
-    probs = torch.sigmoid(logits).squeeze().cpu().numpy()
 
-    results = {}
-    for i, p in enumerate(probs):
-        if p > PREDICTION_THRESHOLD:
-            label = model.config.id2label[i]
-            results[label] = round(float(p), 4)
+def logits(inputs) -> np.ndarray:
+    ort_session = registry.get("ter").ort_session
+    if ort_session is not None:
+        return onnx_logits(ort_session, inputs)
+    return torch_logits(inputs)
+
+
+def predict_emotions_batch(texts: list[str], batch_size: int = 32) -> list[dict]:
+    """
+    Predict emotions for many English texts, padded into shared forward passes.
+    Returns one {label: probability} dict per input, in order.
+    """
+    id2label = registry.get("ter").model.config.id2label
+    results = []
+
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+
+        probs = 1 / (1 + np.exp(-logits(tokenize(chunk))))
+
+        for row in probs:
+            results.append({
+                id2label[i]: round(float(p), 4)
+                for i, p in enumerate(row)
+                if p > PREDICTION_THRESHOLD
+            })
 
     return results
+
+
+def predict_emotion(text: str) -> dict:
+    """
+    Predict emotions from English text.
+    """
+    return predict_emotions_batch([text])[0]
+
+
+# Concurrent requests share one padded forward pass
+batcher = MicroBatcher(
+    predict_emotions_batch,
+    max_batch=settings.TER_MAX_BATCH,
+    max_wait_ms=settings.TER_BATCH_WAIT_MS,
+)
+
+# ... and the same text in flight twice is only predicted once
+flight = SingleFlight("ter")
+
+
+async def predict_emotion_async(text: str) -> dict:
+    """
+    Predict emotions from English text via the micro-batching engine.
+    """
+    text = text_key(text)
+    return await flight.run(text, batcher.submit, text)
@@ -0,0 +1,66 @@
+import asyncio
+import hashlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.core import metrics
+
+
+def text_key(text: str) -> str:
+    """
+    Normalized text input: surrounding and repeated whitespace ignored.
+    """
+    return " ".join(text.split())
+
+
+def audio_key(samples: np.ndarray) -> str:
+    """
+    Hash of decoded audio, so the same upload maps to the same key.
+    """
+    digest = hashlib.sha256(str((samples.dtype, samples.shape)).encode())
+    digest.update(np.ascontiguousarray(samples).tobytes())
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one computation.
+
+    The first caller starts `fn(*args)` as a task; callers arriving while
+    it runs await the same task and get the same result (or exception).
+    Nothing is kept afterwards — caching is a separate concern. Only use
+    it for deterministic calls, where any caller's result is everyone's.
+
+    A caller that is cancelled (e.g. its client disconnected) stops
+    waiting without cancelling the others; the computation itself is
+    cancelled once nobody is waiting for it.
+    """
+
+    def __init__(self, name: str):
+        self._calls: dict[object, tuple[asyncio.Task, list[int]]] = {}
+        self._saved = metrics.counter(f"{name}_calls_saved_total")
+
+    async def run(self, key, fn, *args):
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await fn(*args)
+
+        call = self._calls.get(key)
+        if call is None:
+            call = (asyncio.ensure_future(fn(*args)), [0])
+            self._calls[key] = call
+        else:
+            self._saved.inc()
+
+        task, waiters = call
+        waiters[0] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            waiters[0] -= 1
+            if task.done() or waiters[0] == 0:
+                # Later callers start afresh
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                if not task.done():
+                    task.cancel()
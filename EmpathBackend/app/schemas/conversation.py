@@ -0,0 +1,26 @@
+# Only the fields the frontend (services/api.ts) reads. These take ORM
+# objects or result rows with the same column names. Ids are strings, as
+# the frontend expects, whatever the column type (plain json.dumps in
+# the streamed export can't encode a UUID).
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def conversation_out(c) -> dict:
+    return {
+        "id": str(c.id),
+        "title": c.title,
+        "createdAt": _iso(c.created_at),
+        "updatedAt": _iso(c.updated_at),
+    }
+
+
+def message_out(m) -> dict:
+    return {
+        "id": str(m.id),
+        "conversationId": str(m.conversation_id),
+        "role": m.role,
+        "content": m.content,
+        "createdAt": _iso(m.created_at),
+    }
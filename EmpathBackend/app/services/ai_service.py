@@ -1,67 +1,50 @@
-import asyncio
-import json
-import requests
-import os
+import time
 from app.core.config import settings
+from app.core import metrics
+from app.services.llm_client import llm_client
+from app.services.llm_cache import cached_completion
 
-LLAMA_URL = "http://localhost:8081/completion"
+TTFT = metrics.histogram("llm_time_to_first_token_seconds")
+GENERATION_TIME = metrics.histogram("llm_stream_seconds")
 
-async def stream_ai_response(prompt: str):
-    payload = {
-        "prompt": f"<s>[INST] {prompt} [/INST]",
-        "n_predict": 300,
-        "temperature": 0.7,
-        "top_p": 0.9,
-        "stream": True
-    }
-
-    loop = asyncio.get_running_loop()
-
-    def make_request():
-        return requests.post(
-            LLAMA_URL,
-            json=payload,
-            stream=True,
-            headers={"Content-Type": "application/json"},
-        )
-
-    response = await loop.run_in_executor(None, make_request)
+DEFAULT_MAX_TOKENS = 300
 
-    for line in response.iter_lines(chunk_size=1, decode_unicode=True):
-        if not line:
-            continue
 
-        try:
-            data = json.loads(line)
-        except json.JSONDecodeError:
-            continue
-
-        token = data.get("content")
-        if token:
-            yield token
-            await asyncio.sleep(0)
-
-
-def call_mistral(prompt: str) -> str:
-    payload = {
+def build_payload(prompt: str, temperature: float, max_tokens: int) -> dict:
+    return {
         "prompt": f"<s>[INST] {prompt} [/INST]",
-        "n_predict": 300,
-        "temperature": 0.7,
+        "n_predict": max_tokens,
+        "temperature": temperature,
         "top_p": 0.9,
-        "stream": False
+        # Reuse the KV cache for the prompt prefix shared with the previous request
+        "cache_prompt": True,
     }
 
-    response = requests.post(
-        LLAMA_URL,
-        json=payload,
-        headers={"Content-Type": "application/json"},
-        timeout=60
-    )
 
-    response.raise_for_status()
-    data = response.json()
+async def stream_ai_response(prompt: str, temperature=0.7, max_tokens=DEFAULT_MAX_TOKENS, session=None):
+    payload = build_payload(prompt, temperature, max_tokens)
+
+    started = time.perf_counter()
+    first_token = True
 
-    return data.get("content", "").strip()
+    try:
+        async for token in llm_client.stream(payload, session=session):
+            if first_token:
+                TTFT.observe(time.perf_counter() - started)
+                first_token = False
+            yield token
+    finally:
+        GENERATION_TIME.observe(time.perf_counter() - started)
+
+
+async def call_mistral(prompt: str, temperature=0.7, max_tokens=DEFAULT_MAX_TOKENS, cache=None, session=None) -> str:
+    """
+    `session` (a conversation id) keeps the conversation's turns on one
+    llama.cpp slot; leave it out for one-off prompts like extraction.
+    """
+    payload = build_payload(prompt, temperature, max_tokens)
+    content = await cached_completion(payload, cache, session)
+    return content.strip()
 
 
 # OPENROUTER_API_KEY = settings.OPENROUTER_API_KEY
@@ -0,0 +1,202 @@
+import asyncio
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core import metrics
+from app.models import Message
+from app.services.ai_service import call_mistral
+from app.llm.incident_assistant.prompt_engine import prompt_engine
+
+PROMPT_TOKENS = metrics.histogram("llm_context_tokens")
+
+_encoding = None
+
+
+def load_encoding():
+    """
+    Load tiktoken's cl100k_base. On a cold cache tiktoken downloads it
+    with a blocking request, so this runs once at startup on a thread
+    (point TIKTOKEN_CACHE_DIR at a preloaded copy to skip the download).
+    """
+    global _encoding
+    if _encoding is not None:
+        return
+
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print("⚠️ tiktoken unavailable, estimating tokens:", e)
+        _encoding = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count with cl100k_base. It isn't Mistral's own vocabulary but
+    tracks it closely enough for budgeting; until the encoding is loaded
+    (or if it can't be, offline) ~4 characters per token is used.
+    """
+    if not _encoding:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def fit_window(turns: list, budget: int) -> tuple[list, list, int]:
+    """
+    Split `turns` (oldest first, dicts with role / content) into the older
+    ones that don't fit in `budget` tokens and the most recent ones that
+    do, plus the tokens those use.
+    """
+    used = 0
+    start = len(turns)
+
+    for turn in reversed(turns):
+        cost = count_tokens(turn["content"]) + 4     # role label + newlines
+        if used + cost > budget:
+            break
+        used += cost
+        start -= 1
+
+    return turns[:start], turns[start:], used
+
+
+def format_turns(turns: list) -> str:
+    return "\n".join(
+        f"{'User' if t['role'] == 'user' else 'Assistant'}: {t['content']}"
+        for t in turns
+    )
+
+
+class ConversationContext:
+    __slots__ = ("summary", "turns")
+
+    def __init__(self, summary: str = "", turns: list | None = None):
+        self.summary = summary
+        self.turns = turns or []
+
+    def render(self) -> str:
+        """
+        Prompt section with the rolling summary and the recent turns,
+        or "" for a new conversation.
+        """
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if self.turns:
+            parts.append(f"Recent conversation:\n{format_turns(self.turns)}")
+        return "\n\n".join(parts)
+
+
+class ContextBuilder:
+    """
+    Builds the conversation history part of a prompt within a fixed
+    token budget.
+
+    The most recent messages are loaded with one indexed query and kept
+    verbatim while they fit. Turns that slide out of the window are folded
+    into a per-conversation rolling summary in the background: only the
+    newly evicted turns are sent along with the previous summary, and the
+    current turn uses whatever summary is cached, so summarization never
+    adds latency to a reply.
+    """
+
+    def __init__(self, budget: int, fetch_limit: int, summary_tokens: int, max_conversations: int):
+        self._budget = budget
+        self._fetch_limit = fetch_limit
+        self._summary_tokens = summary_tokens
+        self._max_conversations = max_conversations
+
+        # conversation id -> (summary text, id of the last message it covers)
+        self._summaries: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        self._updating: dict[str, asyncio.Task] = {}
+
+    async def load_turns(self, db: AsyncSession, conversation_id: str) -> list:
+        rows = (
+            await db.execute(
+                select(Message.id, Message.role, Message.content)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(self._fetch_limit)
+            )
+        ).all()
+
+        return [
+            {"id": str(row.id), "role": row.role, "content": row.content}
+            for row in reversed(rows)
+        ]
+
+    async def build(self, db: AsyncSession, conversation_id: str) -> ConversationContext:
+        """
+        Context of the conversation as stored so far (call it before the
+        new user message is flushed).
+        """
+        turns = await self.load_turns(db, conversation_id)
+        return self.fit(conversation_id, turns)
+
+    def fit(self, conversation_id: str, turns: list) -> ConversationContext:
+        summary, covered_until = self._summary(conversation_id)
+        summary_cost = count_tokens(summary) if summary else 0
+
+        evicted, window, used = fit_window(turns, max(self._budget - summary_cost, 0))
+        PROMPT_TOKENS.observe(summary_cost + used)
+
+        # Only turns the cached summary doesn't include yet
+        if covered_until is not None:
+            ids = [t["id"] for t in turns]
+            if covered_until in ids:
+                evicted = evicted[ids.index(covered_until) + 1:]
+
+        if evicted:
+            self._schedule_update(conversation_id, summary, evicted)
+
+        return ConversationContext(summary, window)
+
+    # ===== rolling summary =====
+
+    def _summary(self, conversation_id: str) -> tuple[str, str | None]:
+        entry = self._summaries.get(conversation_id)
+        if entry is None:
+            return "", None
+
+        self._summaries.move_to_end(conversation_id)
+        return entry
+
+    def _schedule_update(self, conversation_id: str, summary: str, evicted: list):
+        if conversation_id in self._updating:
+            return
+
+        task = asyncio.create_task(self._update_summary(conversation_id, summary, evicted))
+        self._updating[conversation_id] = task
+        task.add_done_callback(lambda _: self._updating.pop(conversation_id, None))
+
+    async def _update_summary(self, conversation_id: str, summary: str, evicted: list):
+        prompt = prompt_engine.render(
+            "summary_update",
+            max_words=self._summary_tokens // 2,
+            summary=summary or "(none)",
+            messages=format_turns(evicted),
+        )
+        try:
+            updated = await call_mistral(prompt, temperature=0.0, max_tokens=self._summary_tokens)
+        except Exception as e:
+            print("⚠️ Summary update failed:", e)
+            return
+
+        if not updated:
+            return
+
+        self._summaries[conversation_id] = (updated, evicted[-1]["id"])
+        self._summaries.move_to_end(conversation_id)
+        while len(self._summaries) > self._max_conversations:
+            self._summaries.popitem(last=False)
+
+
+context_builder = ContextBuilder(
+    budget=settings.CONTEXT_TOKEN_BUDGET,
+    fetch_limit=settings.CONTEXT_FETCH_MESSAGES,
+    summary_tokens=settings.CONTEXT_SUMMARY_TOKENS,
+    max_conversations=settings.CONTEXT_SUMMARY_CACHE_SIZE,
+)
@@ -1,30 +1,214 @@
+import asyncio
 import json
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Conversation, Message, Incident
-
-from app.services.incident_service import (
-    INCIDENT_TEMPLATE,
-    merge_entities,
-    completion_percentage
-)
+from app.core.config import settings
+from app.services.message_uow import MessageUnitOfWork
+from app.services.context_builder import context_builder
 
 # ✅ SAFETY ROUTER
 from app.llm.incident_assistant.safety.router import route_request
 from app.llm.incident_assistant.responses.high_risk import high_risk_message
 from app.llm.incident_assistant.responses.pocso import pocso_message
+from app.llm.incident_assistant.prompt_engine import prompt_engine
 
 # Intake + AI
 from app.llm.incident_assistant.intake.entity_extraction import extract_entities
 from app.llm.incident_assistant.intake.questioning import generate_next_question
 from app.llm.incident_assistant.responses.empathy import empathetic_response
-from app.services.ai_service import call_mistral
+from app.services.ai_service import call_mistral, stream_ai_response
+from app.llm.roberta import predict_emotion_async
 
 from langdetect import detect
 from deep_translator import GoogleTranslator
 
 
+async def detect_text_emotion(text: str) -> str:
+    """
+    Text emotion (TER) labels for the prompt's {text_emotion}, strongest
+    first; "unknown" if the model can't be run (not loaded, busy).
+    """
+    try:
+        scores = await predict_emotion_async(text)
+    except Exception as e:
+        print("⚠️ Text emotion unavailable:", e)
+        return "unknown"
+
+    if not scores:
+        return "none detected"
+    return ", ".join(
+        f"{label} ({score:.2f})"
+        for label, score in sorted(scores.items(), key=lambda item: -item[1])
+    )
+
+
+class UserTurn:
+    """
+    One user message through the shared pipeline, split so the reply
+    can be streamed:
+
+    1. `start()` validates the conversation, runs safety routing and
+       saves the user message. Safety routes get their canned reply
+       (already saved) back; raises 404 before any response is sent.
+    2. `reply_tokens()` streams the model reply while entity
+       extraction runs alongside (`extraction`).
+    3. `merge(entities)` folds extraction into the incident state,
+       `compose(reply)` adds the fallback text and intake question,
+       and `save(final_reply)` saves the assistant message and state
+       (`reply_message`). `save_partial(text)` instead keeps a reply
+       cut short by a disconnect.
+    """
+
+    def __init__(
+        self,
+        *,
+        emotion: str,
+        conversation_id: str,
+        normalized_text: str,
+        user_text: str,
+        user,
+        db: AsyncSession,
+    ):
+        self.emotion = emotion
+        self.conversation_id = conversation_id
+        self.normalized_text = normalized_text
+        self.user_text = user_text
+        self.user = user
+
+        self.uow = MessageUnitOfWork(db, conversation_id)
+        self.db = db
+        self.phase = None
+        self.state = None
+        self.extraction: asyncio.Task | None = None
+        self._user_message = None
+        self.reply_message = None
+        self._merged = False
+        self._prompt = None
+
+    async def start(self) -> str | None:
+
+        # =====================================================
+        # 1️⃣ Validate conversation
+        # =====================================================
+
+        if not await self.uow.load():
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        # =====================================================
+        # 🔥 2️⃣ SAFETY ROUTING (RUN FIRST)
+        # =====================================================
+
+        user_age = getattr(self.user, "age", None)
+        mode = route_request(self.user_text, user_age)
+
+        if mode["mode"] in ("HIGH_RISK", "POCSO"):
+            self.phase = mode["mode"].lower()
+            reply = high_risk_message() if mode["mode"] == "HIGH_RISK" else pocso_message()
+
+            self.uow.add_message("user", self.user_text)
+            self.reply_message = await self.uow.finish(reply)
+            return reply
+
+        # =====================================================
+        # ✅ 3️⃣ NORMAL FLOW
+        # =====================================================
+
+        self.phase = "normal"
+
+        # Earlier turns within the token budget (loaded before the new message)
+        context = await context_builder.build(self.db, self.conversation_id)
+
+        # Save USER message (+ new Incident) up front so it survives a failed reply
+        self._user_message = self.uow.add_message("user", self.user_text)
+        self.state = self.uow.incident_state()
+        await self.uow.commit()
+
+        # =====================================================
+        # 4️⃣ Extract entities (runs alongside the reply)
+        # =====================================================
+
+        self.extraction = asyncio.create_task(extract_entities(self.normalized_text))
+        text_emotion = asyncio.create_task(detect_text_emotion(self.normalized_text))
+        if settings.EXTRACTION_MODE == "sequential":
+            self.merge(await self.extraction)
+
+        # =====================================================
+        # 5️⃣ Conversational reply prompt
+        # =====================================================
+
+        self._prompt = prompt_engine.render_chat(
+            mode["template"],
+            "chat_reply",
+            text_emotion=await text_emotion,
+            voice_emotion=self.emotion or "unknown",
+            incident=json.dumps(self.state.fields(), indent=2),
+            history=context.render(),
+            user_text=self.user_text,
+        )
+        return None
+
+    def reply_tokens(self):
+        return stream_ai_response(self._prompt, session=self.conversation_id)
+
+    async def complete_reply(self) -> str:
+        try:
+            return await call_mistral(self._prompt, session=self.conversation_id)
+        except asyncio.CancelledError:
+            self.extraction.cancel()
+            raise
+
+    def merge(self, entities: dict):
+        if not self._merged:
+            self.state.merge(entities, message_id=self._user_message.id)
+            self._merged = True
+
+    def compose(self, reply: str) -> str:
+        """
+        The model reply plus the structured intake question, if the
+        incident is still incomplete.
+        """
+        reply = reply.strip() or "I understand. Could you tell me more?"
+
+        # =====================================================
+        # 6️⃣ Ask structured intake question (if incomplete)
+        # =====================================================
+
+        intake_question = None
+
+        if self.state.completion < 0.7:
+            intake_question = generate_next_question(self.state)
+
+        # =====================================================
+        # 7️⃣ Combine responses
+        # =====================================================
+
+        if intake_question:
+            return (
+                f"{reply}\n\n"
+                f"To better understand your situation, I need to ask:\n"
+                f"{intake_question}"
+            )
+        return reply
+
+    async def save(self, final_reply: str):
+        # Save incident changes + assistant message
+        self.reply_message = await self.uow.finish(final_reply, self.state)
+
+    async def save_partial(self, reply: str):
+        """
+        Save a reply cut short (client gone), with the entities if
+        extraction got that far.
+        """
+        if not reply.strip():
+            return
+
+        extraction = self.extraction
+        if extraction.done() and not extraction.cancelled() and extraction.exception() is None:
+            self.merge(extraction.result())
+        self.reply_message = await self.uow.finish(reply.strip(), self.state)
+
+
 async def process_user_message(
     *,
     emotion: str,
@@ -32,150 +216,37 @@ async def process_user_message(
     normalized_text: str,
     user_text: str,
     user,
-    db: Session,
+    db: AsyncSession,
 ):
-
-    # =====================================================
-    # 1️⃣ Validate conversation
-    # =====================================================
-
-    conversation = db.query(Conversation).filter_by(id=conversation_id).first()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-
-    # Save USER message
-    db.add(Message(
+    """
+    The whole turn without streaming; returns the final reply.
+    """
+    turn = UserTurn(
+        emotion=emotion,
         conversation_id=conversation_id,
-        role="user",
-        content=user_text
-    ))
-    db.commit()
-
-    # =====================================================
-    # 🔥 2️⃣ SAFETY ROUTING (RUN FIRST)
-    # =====================================================
-
-    user_age = getattr(user, "age", None)
-    mode = route_request(user_text, user_age)
-
-    if mode["mode"] == "HIGH_RISK":
-        reply = high_risk_message()
-
-        db.add(Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=reply
-        ))
-        db.commit()
-
-        return {
-            "phase": "high_risk",
-            "reply": reply
-        }
-
-    if mode["mode"] == "POCSO":
-        reply = pocso_message()
-
-        db.add(Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=reply
-        ))
-        db.commit()
-
+        normalized_text=normalized_text,
+        user_text=user_text,
+        user=user,
+        db=db,
+    )
+
+    reply = await turn.start()
+    if reply is not None:
         return {
-            "phase": "pocso",
+            "phase": turn.phase,
             "reply": reply
         }
 
-    # =====================================================
-    # ✅ 3️⃣ NORMAL FLOW
-    # =====================================================
-
-    # Load or create Incident
-    incident = db.query(Incident).filter_by(
-        conversation_id=conversation_id
-    ).first()
+    mistral_reply = await turn.complete_reply()
+    turn.merge(await turn.extraction)
 
-    if not incident:
-        incident = Incident(
-            conversation_id=conversation_id,
-            data=INCIDENT_TEMPLATE.copy(),
-            completion_percentage=0.0
-        )
-        db.add(incident)
-        db.commit()
-        db.refresh(incident)
-
-    # =====================================================
-    # 4️⃣ Extract + merge entities (background)
-    # =====================================================
-
-    extracted = extract_entities(normalized_text)
-    incident.data = merge_entities(dict(incident.data), extracted)
-    incident.completion_percentage = completion_percentage(incident.data)
-
-    db.add(incident)
-    db.commit()
-    db.refresh(incident)
-
-    # =====================================================
-    # 5️⃣ Generate conversational reply using Mistral
-    # =====================================================
-
-    chat_prompt = f"""
-User message:
-{user_text}
-
-Known incident data:
-{json.dumps(incident.data, indent=2)}
-
-Respond helpfully and naturally.
-If the user is asking a question, answer clearly.
-If this relates to a legal or harmful situation,
-provide practical guidance.
-Keep it professional and supportive.
-"""
-
-    mistral_reply = call_mistral(chat_prompt).strip()
-
-    if not mistral_reply:
-        mistral_reply = "I understand. Could you tell me more?"
-
-    # =====================================================
-    # 6️⃣ Ask structured intake question (if incomplete)
-    # =====================================================
-
-    intake_question = None
-
-    if incident.completion_percentage < 0.7:
-        intake_question = generate_next_question(incident.data)
-
-    # =====================================================
-    # 7️⃣ Combine responses
-    # =====================================================
-
-    if intake_question:
-        final_reply = (
-            f"{mistral_reply}\n\n"
-            f"To better understand your situation, I need to ask:\n"
-            f"{intake_question}"
-        )
-    else:
-        final_reply = mistral_reply
-
-    # Save assistant message
-    db.add(Message(
-        conversation_id=conversation_id,
-        role="assistant",
-        content=final_reply
-    ))
-    db.commit()
+    final_reply = turn.compose(mistral_reply)
+    await turn.save(final_reply)
 
     return {
         "phase": "normal",
         "reply": final_reply,
-        "completion": incident.completion_percentage
+        "completion": turn.state.completion
     }
 
 
@@ -0,0 +1,126 @@
+import asyncio
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.core import metrics
+
+CANCELLED = metrics.counter("llm_generations_cancelled_total")
+TOKENS_SAVED = metrics.counter("llm_tokens_saved_total")
+
+_END = object()
+
+
+class ClientDisconnected(Exception):
+    """
+    The client closed the connection before its reply was finished.
+    """
+
+
+class DisconnectWatch:
+    """
+    Polls `request.is_disconnected()` while a reply is being produced and,
+    once the client is gone, cancels the work tied to the request: the
+    upstream llama.cpp call (which closes its connection, so the server
+    stops generating), entity extraction, queued inference jobs.
+
+    Starlette already cancels a StreamingResponse body when the client
+    disconnects mid-stream; the watch also covers work done before the
+    response starts (ASR, a non-streamed reply). Anything with an async
+    `is_disconnected()` can be watched, e.g. a buffered Generation.
+
+        async with DisconnectWatch(request) as watch:
+            text = await watch.run(transcribe(audio))
+            async for token in watch.relay(tokens, budget=300):
+                ...
+
+    Both raise ClientDisconnected when the watch cancelled them.
+    """
+
+    def __init__(self, request: Request, interval: float | None = None):
+        self._request = request
+        self._interval = interval or settings.DISCONNECT_POLL_INTERVAL
+        self._tasks: set[asyncio.Task] = set()
+        self._watcher: asyncio.Task | None = None
+        self.disconnected = False
+
+    async def __aenter__(self):
+        self._watcher = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._watcher.cancel()
+        # Nothing started for this request outlives it
+        for task in self._tasks:
+            task.cancel()
+
+    async def _watch(self):
+        while not await self._request.is_disconnected():
+            await asyncio.sleep(self._interval)
+
+        self.disconnected = True
+        for task in self._tasks:
+            task.cancel()
+
+    def link(self, task: asyncio.Task) -> asyncio.Task:
+        """
+        Cancel `task` if the client disconnects.
+        """
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.disconnected:
+            task.cancel()
+        return task
+
+    async def run(self, awaitable, budget: int | None = None):
+        """
+        Await `awaitable` as a linked task. `budget` (max tokens) marks it
+        as an LLM generation for the cancellation metrics.
+        """
+        task = self.link(asyncio.ensure_future(awaitable))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if budget is not None:
+                CANCELLED.inc()
+                TOKENS_SAVED.inc(budget)
+
+            # Cancelled by the watch rather than by our own caller
+            if self.disconnected and not asyncio.current_task().cancelling():
+                raise ClientDisconnected() from None
+            raise
+
+    async def relay(self, tokens, budget: int):
+        """
+        Yield from the async iterator `tokens`, which is read in a linked
+        task. On disconnect the upstream stream is closed after at most
+        one poll interval, even while it is still waiting for a token.
+        """
+        queue = asyncio.Queue()
+
+        async def produce():
+            async for token in tokens:
+                queue.put_nowait(token)
+
+        producer = self.link(asyncio.create_task(produce()))
+        producer.add_done_callback(lambda _: queue.put_nowait(_END))
+
+        relayed = 0
+        try:
+            while (token := await queue.get()) is not _END:
+                relayed += 1
+                yield token
+
+            if producer.cancelled():
+                raise ClientDisconnected()
+            producer.result()      # re-raise upstream errors
+
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+            if producer.cancelled() or not producer.done():
+                # One streamed chunk is one token for llama.cpp
+                CANCELLED.inc()
+                TOKENS_SAVED.inc(max(budget - relayed, 0))
+
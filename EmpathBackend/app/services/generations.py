@@ -0,0 +1,341 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core import metrics
+from app.utils.sse import SSEStream, sse_comment
+
+RESUMED = metrics.counter("sse_streams_resumed_total")
+
+
+class MemoryStore:
+    """
+    Frames of recent generations in this process.
+
+    Each generation keeps at most `max_frames` frames (oldest dropped
+    first) and lives for `ttl` seconds after its last write; beyond
+    `max_generations` the least recently written one is evicted.
+    """
+
+    def __init__(self, max_generations: int, max_frames: int, ttl: float):
+        self._max_generations = max_generations
+        self._max_frames = max_frames
+        self._ttl = ttl
+        self._buffers: OrderedDict[str, dict] = OrderedDict()
+        self._changed: dict[str, asyncio.Event] = {}
+
+    def _get(self, gid: str) -> dict | None:
+        buffer = self._buffers.get(gid)
+        if buffer is not None and buffer["expires_at"] < time.monotonic():
+            self._drop(gid)
+            return None
+        return buffer
+
+    def _drop(self, gid: str):
+        self._buffers.pop(gid, None)
+        event = self._changed.pop(gid, None)
+        if event is not None:
+            event.set()     # wake readers so they see it's gone
+
+    def _notify(self, gid: str):
+        event = self._changed.pop(gid, None)
+        if event is not None:
+            event.set()
+
+    async def create(self, gid: str, owner: str):
+        now = time.monotonic()
+        self._buffers[gid] = {
+            "owner": owner,
+            "frames": [],
+            "first": 1,             # sequence number of frames[0]
+            "finished": False,
+            "seen_at": now,
+            "expires_at": now + self._ttl,
+        }
+
+        while len(self._buffers) > self._max_generations:
+            self._drop(next(iter(self._buffers)))
+
+    async def owner(self, gid: str) -> str | None:
+        buffer = self._get(gid)
+        return buffer["owner"] if buffer else None
+
+    async def append(self, gid: str, frame: str):
+        buffer = self._get(gid)
+        if buffer is None:
+            return
+
+        frames = buffer["frames"]
+        frames.append(frame)
+        if len(frames) > self._max_frames:
+            del frames[0]
+            buffer["first"] += 1
+
+        buffer["expires_at"] = time.monotonic() + self._ttl
+        self._buffers.move_to_end(gid)
+        self._notify(gid)
+
+    async def finish(self, gid: str):
+        buffer = self._get(gid)
+        if buffer is not None:
+            buffer["finished"] = True
+            self._notify(gid)
+
+    async def read(self, gid: str, after: int) -> tuple[list[str], bool] | None:
+        """
+        Frames with sequence number > `after` and whether the generation
+        is finished; None if it's unknown or those frames were dropped.
+        """
+        buffer = self._get(gid)
+        if buffer is None or after + 1 < buffer["first"]:
+            return None
+
+        return buffer["frames"][after + 1 - buffer["first"]:], buffer["finished"]
+
+    async def wait(self, gid: str, timeout: float):
+        event = self._changed.setdefault(gid, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def touch(self, gid: str):
+        buffer = self._get(gid)
+        if buffer is not None:
+            buffer["seen_at"] = time.monotonic()
+
+    async def idle(self, gid: str) -> float:
+        """
+        Seconds since a reader last touched the generation.
+        """
+        buffer = self._get(gid)
+        if buffer is None:
+            return float("inf")
+        return time.monotonic() - buffer["seen_at"]
+
+
+class RedisStore:
+    """
+    The same buffer in Redis, so a client can resume on any worker.
+
+    Per generation: a list of frames (trimmed to `max_frames`) and a hash
+    with the owner, the sequence number of the first kept frame, the
+    finished flag and when a reader was last attached. Keys expire
+    `ttl` seconds after the last write. Readers poll for new frames.
+    """
+
+    # Frames after ARGV[1] plus the finished flag, in one round trip;
+    # {-1} if those frames were trimmed, nil if the generation is gone
+    READ_SCRIPT = """
+    local meta = redis.call('HMGET', KEYS[2], 'first', 'finished')
+    if not meta[1] then return nil end
+    local start = tonumber(ARGV[1]) + 1 - tonumber(meta[1])
+    if start < 0 then return {-1} end
+    local frames = redis.call('LRANGE', KEYS[1], start, -1)
+    table.insert(frames, 1, meta[2])
+    return frames
+    """
+
+    def __init__(self, url: str, max_frames: int, ttl: float, poll_interval: float = 0.05):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._read = self._redis.register_script(self.READ_SCRIPT)
+        self._max_frames = max_frames
+        self._ttl = int(ttl)
+        self._poll = poll_interval
+
+    @staticmethod
+    def _keys(gid: str) -> tuple[str, str]:
+        return f"generation:{gid}:frames", f"generation:{gid}:meta"
+
+    async def create(self, gid: str, owner: str):
+        frames, meta = self._keys(gid)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(meta, mapping={"owner": owner, "first": 1, "finished": 0, "seen_at": time.time()})
+            pipe.expire(meta, self._ttl)
+            await pipe.execute()
+
+    async def owner(self, gid: str) -> str | None:
+        return await self._redis.hget(self._keys(gid)[1], "owner")
+
+    async def append(self, gid: str, frame: str):
+        frames, meta = self._keys(gid)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(frames, frame)
+            pipe.llen(frames)
+            pipe.expire(frames, self._ttl)
+            pipe.expire(meta, self._ttl)
+            _, length, _, _ = await pipe.execute()
+
+        overflow = length - self._max_frames
+        if overflow > 0:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.ltrim(frames, overflow, -1)
+                pipe.hincrby(meta, "first", overflow)
+                await pipe.execute()
+
+    async def finish(self, gid: str):
+        await self._redis.hset(self._keys(gid)[1], "finished", 1)
+
+    async def read(self, gid: str, after: int) -> tuple[list[str], bool] | None:
+        result = await self._read(keys=self._keys(gid), args=[after])
+        if not result or result[0] == -1:
+            return None
+        return result[1:], result[0] == "1"
+
+    async def wait(self, gid: str, timeout: float):
+        await asyncio.sleep(min(self._poll, timeout))
+
+    async def touch(self, gid: str):
+        await self._redis.hset(self._keys(gid)[1], "seen_at", time.time())
+
+    async def idle(self, gid: str) -> float:
+        seen_at = await self._redis.hget(self._keys(gid)[1], "seen_at")
+        if seen_at is None:
+            return float("inf")
+        return time.time() - float(seen_at)
+
+
+class Generation:
+    """
+    One assistant reply, produced in the background into the store and
+    streamed to whoever follows it.
+
+    Every frame carries the event id "<generation id>:<sequence>". A
+    client that lost the stream sends its last id back (Last-Event-ID)
+    and `follow()` replays what it missed, then tails the rest, without
+    generating again.
+
+    The producer keeps going while nobody is attached for up to `grace`
+    seconds so a reconnect can pick it up; after that `is_disconnected()`
+    turns true and a DisconnectWatch on the generation cancels it.
+    """
+
+    def __init__(self, store, gid: str, grace: float):
+        self._store = store
+        self.id = gid
+        self._grace = grace
+        self._task: asyncio.Task | None = None
+
+    def sse(self) -> SSEStream:
+        # Followers send their own heartbeats
+        return SSEStream(event_prefix=f"{self.id}:", heartbeat=0)
+
+    async def is_disconnected(self) -> bool:
+        return await self._store.idle(self.id) > self._grace
+
+    def start(self, frames):
+        """
+        Run the async iterator of SSE frames `frames`, buffering them.
+        """
+        async def produce():
+            try:
+                async for chunk in frames:
+                    # One stored frame per event id
+                    for frame in chunk.split("\n\n"):
+                        if frame and not frame.startswith(":"):
+                            await self._store.append(self.id, frame + "\n\n")
+            except Exception as e:
+                print(f"⚠️ Generation {self.id} failed: {e!r}")
+            finally:
+                await self._store.finish(self.id)
+
+        self._task = asyncio.create_task(produce())
+        _running.add(self._task)
+        self._task.add_done_callback(_running.discard)
+
+    async def follow(self, after: int = 0):
+        """
+        Frames after sequence number `after`, until the generation ends.
+        """
+        heartbeat = settings.SSE_HEARTBEAT_SECONDS
+        touch_every = max(self._grace / 3, 0.1)
+        last_sent = time.monotonic()
+        touched = 0.0
+
+        while True:
+            # Tell the producer someone is still listening
+            if time.monotonic() - touched >= touch_every:
+                touched = time.monotonic()
+                await self._store.touch(self.id)
+
+            result = await self._store.read(self.id, after)
+            if result is None:
+                return      # evicted meanwhile
+
+            frames, finished = result
+            if frames:
+                after += len(frames)
+                last_sent = time.monotonic()
+                yield "".join(frames)
+                continue
+
+            if finished:
+                return
+
+            if time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield sse_comment("keep-alive")
+                continue    # frames may have arrived meanwhile
+
+            await self._store.wait(self.id, touch_every)
+
+
+# Producer tasks, referenced so they aren't garbage collected mid-reply
+_running: set[asyncio.Task] = set()
+
+
+def _make_store():
+    if settings.STREAM_BUFFER_URL:
+        return RedisStore(
+            settings.STREAM_BUFFER_URL,
+            max_frames=settings.STREAM_BUFFER_FRAMES,
+            ttl=settings.STREAM_BUFFER_TTL,
+        )
+
+    return MemoryStore(
+        max_generations=settings.STREAM_BUFFER_GENERATIONS,
+        max_frames=settings.STREAM_BUFFER_FRAMES,
+        ttl=settings.STREAM_BUFFER_TTL,
+    )
+
+
+store = _make_store()
+
+
+async def new_generation(owner: str) -> Generation:
+    """
+    `owner` ties the generation to a user and conversation, so only
+    they can resume it.
+    """
+    generation = Generation(store, uuid.uuid4().hex, settings.STREAM_RESUME_GRACE)
+    await store.create(generation.id, owner)
+    await store.touch(generation.id)
+    return generation
+
+
+async def resume(last_event_id: str, owner: str):
+    """
+    Frames after `last_event_id` ("<generation id>:<sequence>") for a
+    client reconnecting to its stream.
+    """
+    gid, _, seq = last_event_id.strip().rpartition(":")
+    if not gid or not seq.isdigit():
+        raise HTTPException(status_code=400, detail="Malformed Last-Event-ID")
+
+    stored_owner = await store.owner(gid)
+    if stored_owner is None or stored_owner != owner:
+        raise HTTPException(status_code=404, detail="Unknown stream")
+
+    after = int(seq)
+    if await store.read(gid, after) is None:
+        raise HTTPException(status_code=410, detail="Stream can no longer be resumed")
+
+    RESUMED.inc()
+    generation = Generation(store, gid, settings.STREAM_RESUME_GRACE)
+    return generation.follow(after)
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core import metrics
+from app.core.database import AsyncSessionLocal
+from app.models import Message
+from app.services import generations
+from app.utils.sse import SSEStream
+
+REPLAYED = metrics.counter("idempotent_replays_total")
+JOINED = metrics.counter("idempotent_joins_total")
+
+
+def fingerprint(*parts) -> str:
+    """
+    Hash of what a request sends, so a key reused for a different
+    message is rejected instead of answered with the wrong reply.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class MemoryKeys:
+    """
+    Idempotency records in this process: `ttl` seconds each, at most
+    `max_keys` (least recently claimed dropped first).
+    """
+
+    def __init__(self, max_keys: int, ttl: float):
+        self._max_keys = max_keys
+        self._ttl = ttl
+        self._records: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def get(self, key: str) -> dict | None:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._records[key]
+            return None
+        return entry[1]
+
+    async def claim(self, key: str, record: dict) -> bool:
+        if await self.get(key) is not None:
+            return False
+
+        self._records[key] = (time.monotonic() + self._ttl, record)
+        while len(self._records) > self._max_keys:
+            self._records.popitem(last=False)
+        return True
+
+    async def update(self, key: str, record: dict):
+        entry = self._records.get(key)
+        if entry is not None:
+            self._records[key] = (entry[0], record)
+
+    async def delete(self, key: str):
+        self._records.pop(key, None)
+
+
+class RedisKeys:
+    """
+    The same records in Redis (SET NX + TTL), shared by every worker.
+    """
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._ttl = int(ttl)
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"idempotency:{key}"
+
+    async def get(self, key: str) -> dict | None:
+        raw = await self._redis.get(self._key(key))
+        return json.loads(raw) if raw else None
+
+    async def claim(self, key: str, record: dict) -> bool:
+        return bool(await self._redis.set(self._key(key), json.dumps(record), nx=True, ex=self._ttl))
+
+    async def update(self, key: str, record: dict):
+        await self._redis.set(self._key(key), json.dumps(record), xx=True, keepttl=True)
+
+    async def delete(self, key: str):
+        await self._redis.delete(self._key(key))
+
+
+def _make_keys():
+    if settings.STREAM_BUFFER_URL:
+        return RedisKeys(settings.STREAM_BUFFER_URL, ttl=settings.IDEMPOTENCY_TTL)
+    return MemoryKeys(max_keys=settings.IDEMPOTENCY_MAX_KEYS, ttl=settings.IDEMPOTENCY_TTL)
+
+
+keys = _make_keys()
+
+
+class Idempotency:
+    """
+    One request's `Idempotency-Key`, scoped to the user and endpoint.
+
+    The first request with a key claims it and records its progress:
+    "pending" (transcribing, routing), then "streaming" with the
+    generation id, then "done" with the assistant message id. A
+    duplicate gets, instead of a second run:
+
+    - while pending: waits for the original to get that far;
+    - while streaming: the same generation, from its first frame;
+    - when done: the buffered frames, or the saved reply once the
+      buffer has expired.
+
+    If the original fails, or its reply ends without a saved message,
+    the key is released and the next duplicate runs as a fresh request;
+    so does a duplicate of a "streaming" record whose buffer is gone.
+    Without a header every method is a no-op.
+    """
+
+    def __init__(self, key: str | None, scope: str):
+        self.key = f"{scope}:{key}" if key else None
+        self._record: dict | None = None
+
+    async def claim(self, request_fingerprint: str, owner: str):
+        """
+        None if this request should run; otherwise the SSE frames to
+        answer the duplicate with. `owner` is the generation owner
+        (user and conversation).
+        """
+        if self.key is None:
+            return None
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while True:
+            record = {"fingerprint": request_fingerprint, "state": "pending"}
+            if await keys.claim(self.key, record):
+                self._record = record
+                return None
+
+            existing = await keys.get(self.key)
+            if existing is None:
+                continue        # released or expired meanwhile
+
+            if existing["fingerprint"] != request_fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used for a different request",
+                )
+
+            frames = await self._replay(existing, owner)
+            if frames is not None:
+                return frames
+
+            if existing["state"] == "streaming":
+                # Nothing left to join (e.g. its worker died): run again
+                await keys.delete(self.key)
+                continue
+
+            if time.monotonic() > deadline:
+                raise HTTPException(status_code=409, detail="Original request is still processing")
+            await asyncio.sleep(0.1)
+
+    async def _replay(self, record: dict, owner: str):
+        state = record["state"]
+
+        if record.get("generation"):
+            try:
+                frames = await generations.resume(f"{record['generation']}:0", owner)
+            except HTTPException:
+                frames = None       # buffer expired
+
+            if frames is not None:
+                (JOINED if state == "streaming" else REPLAYED).inc()
+                return frames
+
+        if state == "done":
+            REPLAYED.inc()
+            return _saved_reply(record["message"])
+
+        return None
+
+    async def started(self, generation_id: str):
+        if self._record is not None:
+            self._record = {**self._record, "state": "streaming", "generation": generation_id}
+            await keys.update(self.key, self._record)
+
+    async def finished(self, message_id):
+        if self._record is not None:
+            self._record = {**self._record, "state": "done", "message": str(message_id)}
+            await keys.update(self.key, self._record)
+
+    async def release(self):
+        """
+        The original failed before streaming; let a retry run.
+        """
+        if self._record is not None and self._record["state"] == "pending":
+            await keys.delete(self.key)
+            self._record = None
+
+    async def abandon(self):
+        """
+        The reply ended without a saved message (the model call failed,
+        the client left before any token); let a retry run.
+        """
+        if self._record is not None and self._record["state"] != "done":
+            await keys.delete(self.key)
+            self._record = None
+
+
+async def _saved_reply(message_id: str):
+    async with AsyncSessionLocal() as db:
+        message = await db.get(Message, message_id)
+
+    sse = SSEStream()
+    if message is not None:
+        yield sse.content(message.content)
+    yield sse.done()
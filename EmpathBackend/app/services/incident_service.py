@@ -1,3 +1,10 @@
+from sqlalchemy import update, cast
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models import Incident
+
 INCIDENT_TEMPLATE = {
     "suspect": None,
     "relationship_to_accused": None,
@@ -19,13 +26,141 @@ INCIDENT_TEMPLATE = {
     "final_question_asked": False
 }
 
-def merge_entities(existing, extracted):
-    for k, v in extracted.items():
-        if v is not None and existing.get(k) is None:
-            existing[k] = v
-    return existing
+FIELDS = tuple(INCIDENT_TEMPLATE)
+_BIT = {field: 1 << i for i, field in enumerate(FIELDS)}
+
+# Which message filled each field, stored alongside the fields in Incident.data
+PROVENANCE_KEY = "_provenance"
+
+
+def new_incident_data() -> dict:
+    """
+    Fresh incident data; unlike INCIDENT_TEMPLATE.copy() the
+    asked_fields list is not shared between incidents.
+    """
+    return {k: list(v) if isinstance(v, list) else v for k, v in INCIDENT_TEMPLATE.items()}
+
+
+class IncidentState:
+    """
+    In-memory incident fields with incremental completion tracking.
+
+    Filled fields are kept as a bitset with a running count, so
+    `completion` is O(1) and merges only touch the extracted keys.
+    Changed keys are remembered so `patch()` returns just those for
+    persistence instead of the whole dict.
+
+    Supports get / [] / []= so it can be handed to generate_next_question.
+    """
+
+    __slots__ = ("_values", "_filled", "_count", "_dirty", "provenance")
+
+    def __init__(self, data: dict | None = None):
+        self._values = new_incident_data()
+        self._values.update({k: v for k, v in (data or {}).items() if k in _BIT})
+        self.provenance = dict((data or {}).get(PROVENANCE_KEY) or {})
+        self._dirty = set()
+
+        self._filled = 0
+        for field, value in self._values.items():
+            if value is not None:
+                self._filled |= _BIT[field]
+        self._count = bin(self._filled).count("1")
+
+    def _set(self, field: str, value):
+        bit = _BIT[field]
+        was_filled = bool(self._filled & bit)
+
+        self._values[field] = value
+        self._dirty.add(field)
+
+        if value is not None and not was_filled:
+            self._filled |= bit
+            self._count += 1
+        elif value is None and was_filled:
+            self._filled &= ~bit
+            self._count -= 1
+
+    def is_filled(self, field: str) -> bool:
+        return bool(self._filled & _BIT[field])
+
+    @property
+    def completion(self) -> float:
+        return self._count / len(FIELDS)
+
+    def merge(self, extracted: dict, message_id=None) -> list[str]:
+        """
+        Fill empty fields from `extracted`; already known values win.
+        Returns the fields that changed.
+        """
+        changed = []
+        for field, value in extracted.items():
+            if value is None or field not in _BIT or self.is_filled(field):
+                continue
+
+            self._set(field, value)
+            changed.append(field)
+
+            if message_id is not None:
+                self.provenance[field] = str(message_id)
+                self._dirty.add(PROVENANCE_KEY)
+
+        return changed
+
+    def get(self, field: str, default=None):
+        value = self._values.get(field)
+        return default if value is None else value
+
+    def __getitem__(self, field: str):
+        return self._values[field]
+
+    def __setitem__(self, field: str, value):
+        self._set(field, value)
+
+    def patch(self) -> dict:
+        """
+        Changed keys since the last patch, ready to merge into Incident.data.
+        """
+        patch = {}
+        for key in self._dirty:
+            patch[key] = dict(self.provenance) if key == PROVENANCE_KEY else self._values[key]
+
+        self._dirty.clear()
+        return patch
+
+    def fields(self) -> dict:
+        """
+        Incident fields only (no provenance), e.g. for prompts.
+        """
+        return dict(self._values)
+
+    def to_dict(self) -> dict:
+        data = dict(self._values)
+        if self.provenance:
+            data[PROVENANCE_KEY] = dict(self.provenance)
+        return data
+
+
+async def save_incident_state(db: AsyncSession, incident: Incident, state: IncidentState):
+    """
+    Persist only the changed keys with a server-side JSON merge,
+    rather than rewriting the whole Incident.data column.
+    The caller owns the transaction.
+    """
+    patch = state.patch()
+    if not patch:
+        return
+
+    await db.execute(
+        update(Incident)
+        .where(Incident.id == incident.id)
+        .values(
+            data=cast(Incident.data, JSONB).op("||")(cast(patch, JSONB)),
+            completion_percentage=state.completion,
+        )
+        .execution_options(synchronize_session=False)
+    )
 
-def completion_percentage(data):
-    total = len(data)
-    filled = sum(1 for v in data.values() if v is not None)
-    return filled / total
+    # Keep the loaded object current without marking it dirty (no refresh needed)
+    set_committed_value(incident, "data", state.to_dict())
+    set_committed_value(incident, "completion_percentage", state.completion)
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core import metrics
+from app.llm.single_flight import SingleFlight
+from app.services.llm_client import llm_client
+
+
+class CompletionCache:
+    """
+    Two-level cache of llama.cpp completions keyed by the request payload.
+
+    Level 1 is an in-process LRU. Level 2 is an optional SQLite file shared
+    by every worker on the host. Both expire entries after `ttl` seconds
+    and evict least recently used entries beyond their size limits.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, db_path: str | None = None, max_db_entries: int = 0):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+        self._db_path = db_path
+        self._max_db_entries = max_db_entries
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+        self._memory_hits = metrics.counter("llm_cache_memory_hits_total")
+        self._disk_hits = metrics.counter("llm_cache_disk_hits_total")
+        self._misses = metrics.counter("llm_cache_misses_total")
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ===== in-process LRU =====
+
+    def _memory_get(self, key: str) -> str | None:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._memory[key]
+            return None
+
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: str, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    # ===== persistent SQLite layer =====
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_completions_accessed ON completions (accessed_at)"
+            )
+        return self._db
+
+    def _disk_get(self, key: str) -> tuple[float, str] | None:
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT value, expires_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            if row[1] < now:
+                db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                db.commit()
+                return None
+
+            db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            return row[1], row[0]
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+
+            # Amortize eviction: sweep expired and oversized entries every 100 writes
+            self._writes += 1
+            if self._writes % 100 == 0:
+                db.execute("DELETE FROM completions WHERE expires_at < ?", (now,))
+                db.execute(
+                    "DELETE FROM completions WHERE key IN ("
+                    "  SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?"
+                    ")",
+                    (self._max_db_entries,),
+                )
+            db.commit()
+
+    # ===== public API =====
+
+    async def get(self, key: str) -> str | None:
+        value = self._memory_get(key)
+        if value is not None:
+            self._memory_hits.inc()
+            return value
+
+        if self._db_path:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                self._disk_hits.inc()
+                self._memory_set(key, entry[1], entry[0])
+                return entry[1]
+
+        self._misses.inc()
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self._ttl
+        self._memory_set(key, value, expires_at)
+
+        if self._db_path:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+
+completion_cache = CompletionCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL,
+    db_path=settings.LLM_CACHE_DB_PATH,
+    max_db_entries=settings.LLM_CACHE_DB_MAX_ENTRIES,
+)
+
+
+# Identical cacheable completions in flight at once share one llama.cpp call
+completion_flight = SingleFlight("llm")
+
+
+async def cached_completion(payload: dict, cache: bool | None = None, session: str | None = None) -> str:
+    """
+    Complete `payload` through the cache. By default only deterministic
+    (temperature 0) calls are cached; pass cache=True/False to override.
+    `session` pins the call to that conversation's server slot.
+
+    Cacheable calls are also coalesced: while one is in flight, the
+    same payload from another request waits for its result.
+    """
+    if cache is None:
+        cache = payload.get("temperature") == 0
+
+    if not cache:
+        return await llm_client.complete(payload, session=session)
+
+    key = completion_cache.key(payload)
+
+    if settings.LLM_CACHE_ENABLED:
+        content = await completion_cache.get(key)
+        if content is not None:
+            return content
+
+    return await completion_flight.run(key, _complete, key, payload, session)
+
+
+async def _complete(key: str, payload: dict, session: str | None) -> str:
+    content = await llm_client.complete(payload, session=session)
+    if content.strip() and settings.LLM_CACHE_ENABLED:
+        await completion_cache.set(key, content)
+
+    return content
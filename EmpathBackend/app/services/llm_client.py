@@ -0,0 +1,369 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.core.config import settings
+from app.core import metrics
+from app.services.llm_slots import SlotAllocator
+
+PROMPT_EVAL = metrics.histogram("llm_prompt_eval_seconds")
+FAILURES = metrics.counter("llm_backend_failures_total")
+RETRIES = metrics.counter("llm_retries_total")
+CIRCUIT_OPENED = metrics.counter("llm_circuit_opened_total")
+
+
+class LLMUnavailable(Exception):
+    """
+    No llama.cpp backend is healthy with a closed (or trial) circuit.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets one trial call through (half-open):
+    success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._cooldown:
+            return "half-open"
+        return "open"
+
+    def allows(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self._trial)
+
+    def begin(self):
+        if self.state == "half-open":
+            self._trial = True
+
+    def abandon(self):
+        """
+        The call ended without a verdict (e.g. the client went away).
+        """
+        self._trial = False
+
+    def success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def failure(self):
+        self._failures += 1
+        self._trial = False
+        if self._opened_at is not None or self._failures >= self._threshold:
+            if self._opened_at is None:
+                CIRCUIT_OPENED.inc()
+            self._opened_at = time.monotonic()
+
+
+class Backend:
+    """
+    One llama.cpp server: its own slot allocator, circuit breaker,
+    health flag and count of requests in flight.
+    """
+
+    def __init__(self, url: str, *, slots: int, breaker: CircuitBreaker):
+        self.url = url
+        self.health_url = str(httpx.URL(url).copy_with(path="/health", query=None))
+        self.props_url = str(httpx.URL(url).copy_with(path="/props", query=None))
+        self.slots = SlotAllocator(slots) if slots > 0 else None
+        self.breaker = breaker
+        self.healthy = True
+        self.outstanding = 0
+
+    def available(self) -> bool:
+        return self.healthy and self.breaker.allows()
+
+    def status(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "outstanding": self.outstanding,
+        }
+
+
+class LLMClient:
+    """
+    Shared async client for a pool of llama.cpp completion servers.
+
+    One pooled httpx client keeps connections alive between calls, and a
+    semaphore caps how many generations this worker runs at once so a burst
+    of users queues here instead of overloading the servers.
+
+    Each call goes to the available backend with the fewest requests in
+    flight, except that a `session` (conversation id) stays on the backend
+    and slot already holding its KV cache while that backend is available.
+    Backends are taken out of rotation by failed health checks or by their
+    circuit breaker. Failed calls are retried on another backend when that
+    is safe: always if the request never connected, otherwise only for
+    deterministic (temperature 0) calls.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        *,
+        connect_timeout: float,
+        read_timeout: float,
+        max_connections: int,
+        max_keepalive: int,
+        max_concurrency: int,
+        slots: int = 0,
+        breaker_threshold: int = 3,
+        breaker_cooldown: float = 30.0,
+        health_interval: float = 10.0,
+    ):
+        self.backends = [
+            Backend(url, slots=slots, breaker=CircuitBreaker(breaker_threshold, breaker_cooldown))
+            for url in urls
+        ]
+        self._timeout = httpx.Timeout(
+            read_timeout,
+            connect=connect_timeout,
+        )
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        # LLM_MAX_CONCURRENCY is per backend
+        self._max_concurrency = max_concurrency * len(self.backends)
+        self._health_interval = health_interval
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._health_task: asyncio.Task | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                headers={"Content-Type": "application/json"},
+            )
+        return self._client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphore
+
+    # ===== backend selection =====
+
+    def _pick(self, session: str | None, tried: set) -> Backend:
+        candidates = [b for b in self.backends if b not in tried and b.available()]
+        if not candidates:
+            raise LLMUnavailable("No llama.cpp backend available")
+
+        if session is not None:
+            for backend in candidates:
+                if backend.slots is not None and backend.slots.slot_of(session) is not None:
+                    return backend
+
+        return min(candidates, key=lambda b: b.outstanding)
+
+    @asynccontextmanager
+    async def _attempt(self, payload: dict, session: str | None, tried: set):
+        """
+        (backend, payload with its id_slot) for one try, tracking the
+        outstanding count and feeding the result to the circuit breaker.
+        """
+        backend = self._pick(session, tried)
+        tried.add(backend)
+
+        slot = None
+        if session is not None and backend.slots is not None:
+            slot = backend.slots.acquire(session)
+            payload = {**payload, "id_slot": slot}
+
+        backend.outstanding += 1
+        backend.breaker.begin()
+        try:
+            yield backend, payload
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                backend.breaker.abandon()     # our request was bad, not the backend
+            else:
+                FAILURES.inc()
+                backend.breaker.failure()
+            raise
+        except BaseException:
+            backend.breaker.abandon()
+            raise
+        else:
+            backend.breaker.success()
+        finally:
+            backend.outstanding -= 1
+            if slot is not None:
+                backend.slots.release(slot)
+
+    def _retryable(self, error: Exception, payload: dict, tried: set) -> bool:
+        if len(tried) >= len(self.backends):
+            return False
+        if isinstance(error, httpx.ConnectError):
+            return True     # the server never saw the request
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code < 500:
+            return False
+        return payload.get("temperature") == 0
+
+    @staticmethod
+    def _record_timings(data: dict):
+        timings = data.get("timings") or {}
+        if "prompt_ms" in timings:
+            PROMPT_EVAL.observe(timings["prompt_ms"] / 1000)
+
+    # ===== completion API =====
+
+    async def complete(self, payload: dict, session: str | None = None) -> str:
+        tried = set()
+
+        async with self._get_semaphore():
+            while True:
+                try:
+                    async with self._attempt(payload, session, tried) as (backend, body):
+                        response = await self._get_client().post(
+                            backend.url,
+                            json={**body, "stream": False},
+                        )
+                        response.raise_for_status()
+
+                    data = response.json()
+                    self._record_timings(data)
+                    return data.get("content", "")
+
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    if not self._retryable(e, payload, tried):
+                        raise
+                    RETRIES.inc()
+                    print(f"⚠️ LLM backend failed ({e!r}), retrying on another replica")
+
+    async def stream(self, payload: dict, session: str | None = None):
+        """
+        Yield content chunks as llama.cpp produces them. A failed call is
+        only retried before the first chunk has been yielded.
+        """
+        tried = set()
+
+        async with self._get_semaphore():
+            while True:
+                started = False
+                try:
+                    async with self._attempt(payload, session, tried) as (backend, body):
+                        async with self._get_client().stream(
+                            "POST",
+                            backend.url,
+                            json={**body, "stream": True},
+                        ) as response:
+                            response.raise_for_status()
+
+                            async for line in response.aiter_lines():
+                                if not line:
+                                    continue
+
+                                # llama.cpp frames streamed chunks as SSE: "data: {...}"
+                                if line.startswith("data:"):
+                                    line = line[len("data:"):].strip()
+
+                                try:
+                                    data = json.loads(line)
+                                except json.JSONDecodeError:
+                                    continue
+
+                                token = data.get("content")
+                                if token:
+                                    started = True
+                                    yield token
+
+                                if data.get("stop"):
+                                    self._record_timings(data)
+                                    break
+                    return
+
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    if started or not self._retryable(e, payload, tried):
+                        raise
+                    RETRIES.inc()
+                    print(f"⚠️ LLM backend failed ({e!r}), retrying on another replica")
+
+    # ===== health checks =====
+
+    async def check_health(self):
+        client = self._get_client()
+
+        async def check(backend: Backend):
+            try:
+                response = await client.get(backend.health_url, timeout=5.0)
+                healthy = response.status_code == 200
+            except httpx.HTTPError:
+                healthy = False
+
+            if healthy != backend.healthy:
+                print(f"{'✅' if healthy else '⚠️'} LLM backend {backend.url} healthy={healthy}")
+            backend.healthy = healthy
+
+            if healthy and backend.slots is not None:
+                await check_slots(backend)
+
+        async def check_slots(backend: Backend):
+            # An id_slot the server doesn't have is never served, so
+            # never pin beyond its real slot count
+            try:
+                response = await client.get(backend.props_url, timeout=5.0)
+                total = int(response.json()["total_slots"])
+            except (httpx.HTTPError, ValueError, KeyError, TypeError):
+                return
+
+            if 0 < total < backend.slots.n_slots:
+                print(f"⚠️ LLM backend {backend.url} has {total} slots, LLM_SLOTS={backend.slots.n_slots}")
+                backend.slots.resize(total)
+
+        await asyncio.gather(*(check(b) for b in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self._health_interval)
+
+    def start_health_checks(self):
+        if self._health_interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    def status(self) -> list[dict]:
+        return [b.status() for b in self.backends]
+
+    async def aclose(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_client = LLMClient(
+    settings.llama_urls(),
+    connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+    read_timeout=settings.LLM_READ_TIMEOUT,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_keepalive=settings.LLM_MAX_KEEPALIVE,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    slots=settings.LLM_SLOTS,
+    breaker_threshold=settings.LLM_BREAKER_THRESHOLD,
+    breaker_cooldown=settings.LLM_BREAKER_COOLDOWN,
+    health_interval=settings.LLM_HEALTH_INTERVAL,
+)
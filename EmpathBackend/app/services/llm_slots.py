@@ -0,0 +1,81 @@
+from collections import Counter, OrderedDict
+
+from app.core import metrics
+
+
+class SlotAllocator:
+    """
+    Pins sessions (conversations) to llama.cpp slots so each turn is sent
+    with the `id_slot` whose KV cache already holds that conversation's
+    prompt prefix; with cache_prompt the server then only evaluates the
+    new tokens.
+
+    A session keeps its slot until it is the least recently used one and
+    another session needs a slot. Slots with a request in flight are never
+    reassigned; if every slot is busy the request goes unpinned (-1) and
+    the server picks a slot itself.
+    """
+
+    def __init__(self, n_slots: int):
+        self.n_slots = n_slots
+        self._owners: OrderedDict[str, int] = OrderedDict()    # LRU order
+        self._busy: Counter = Counter()
+
+        self._hits = metrics.counter("llm_slot_hits_total")
+        self._assigned = metrics.counter("llm_slot_assignments_total")
+        self._evictions = metrics.counter("llm_slot_evictions_total")
+        self._unpinned = metrics.counter("llm_slot_unpinned_total")
+
+    def acquire(self, session: str) -> int:
+        slot = self._owners.get(session)
+
+        if slot is not None:
+            self._owners.move_to_end(session)
+            self._hits.inc()
+        else:
+            slot = self._take_slot()
+            if slot is None:
+                self._unpinned.inc()
+                return -1
+
+            self._owners[session] = slot
+            self._assigned.inc()
+
+        self._busy[slot] += 1
+        return slot
+
+    def release(self, slot: int):
+        if slot < 0:
+            return
+
+        self._busy[slot] -= 1
+        if self._busy[slot] <= 0:
+            del self._busy[slot]
+
+    def _take_slot(self) -> int | None:
+        taken = set(self._owners.values())
+        for slot in range(self.n_slots):
+            if slot not in taken:
+                return slot
+
+        # Evict the least recently used session whose slot is idle
+        for session, slot in self._owners.items():
+            if not self._busy.get(slot):
+                del self._owners[session]
+                self._evictions.inc()
+                return slot
+
+        return None
+
+    def resize(self, n_slots: int):
+        """
+        Match the server's slot count; sessions on slots it doesn't
+        have are unpinned.
+        """
+        self.n_slots = n_slots
+        for session, slot in list(self._owners.items()):
+            if slot >= n_slots:
+                del self._owners[session]
+
+    def slot_of(self, session: str) -> int | None:
+        return self._owners.get(session)
@@ -1,10 +1,8 @@
-from sqlalchemy.orm import Session
-from app.models import Conversation, Message, Incident
-from app.services.incident_service import (
-    INCIDENT_TEMPLATE,
-    merge_entities,
-    completion_percentage
-)
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.message_uow import MessageUnitOfWork
+from app.services.context_builder import context_builder
 
 # 🔥 SAFETY
 from app.llm.incident_assistant.safety.router import route_request
@@ -17,12 +15,12 @@ from app.llm.incident_assistant.intake.questioning import generate_next_question
 from app.services.ai_service import call_mistral
 
 
-def handle_text_message(
+async def handle_text_message(
     *,
     conversation_id: str,
     user_text: str,
     user,
-    db: Session,
+    db: AsyncSession,
 ):
     """
     Full pipeline:
@@ -37,21 +35,11 @@ def handle_text_message(
     if not user_text:
         raise ValueError("Empty user message")
 
-    # 1️⃣ Validate conversation
-    conversation = db.query(Conversation).filter_by(id=conversation_id).first()
-    if not conversation:
+    # 1️⃣ Validate conversation (+ load its incident)
+    uow = MessageUnitOfWork(db, conversation_id)
+    if not await uow.load():
         raise ValueError("Conversation not found")
 
-    # 2️⃣ Save USER message
-    db.add(
-        Message(
-            conversation_id=conversation_id,
-            role="user",
-            content=user_text,
-        )
-    )
-    db.commit()
-
     # =====================================================
     # 🔥 SAFETY ROUTING FIRST
     # =====================================================
@@ -62,14 +50,8 @@ def handle_text_message(
     if mode["mode"] == "HIGH_RISK":
         reply = high_risk_message()
 
-        db.add(
-            Message(
-                conversation_id=conversation_id,
-                role="assistant",
-                content=reply,
-            )
-        )
-        db.commit()
+        uow.add_message("user", user_text)
+        await uow.finish(reply)
 
         return {
             "phase": "high_risk",
@@ -79,14 +61,8 @@ def handle_text_message(
     if mode["mode"] == "POCSO":
         reply = pocso_message()
 
-        db.add(
-            Message(
-                conversation_id=conversation_id,
-                role="assistant",
-                content=reply,
-            )
-        )
-        db.commit()
+        uow.add_message("user", user_text)
+        await uow.finish(reply)
 
         return {
             "phase": "pocso",
@@ -97,51 +73,47 @@ def handle_text_message(
     # ✅ NORMAL FLOW
     # =====================================================
 
-    # 3️⃣ Load or create Incident
-    incident = (
-        db.query(Incident)
-        .filter_by(conversation_id=conversation_id)
-        .first()
-    )
-
-    if not incident:
-        incident = Incident(
-            conversation_id=conversation_id,
-            data=INCIDENT_TEMPLATE.copy(),
-            completion_percentage=0.0,
-        )
-        db.add(incident)
-        db.commit()
-        db.refresh(incident)
-
-    # 4️⃣ Extract entities
-    extracted = extract_entities(user_text)
-    incident.data = merge_entities(dict(incident.data), extracted)
-
-    # 5️⃣ Update completion %
-    incident.completion_percentage = completion_percentage(incident.data)
-
-    db.add(incident)
-    db.commit()
-    db.refresh(incident)
+    # Earlier turns within the token budget (loaded before the new message)
+    context = await context_builder.build(db, conversation_id)
+
+    # 2️⃣ Save USER message (+ new Incident) before generating,
+    # so it isn't lost if generation fails
+    user_message = uow.add_message("user", user_text)
+    state = uow.incident_state()
+    await uow.commit()
+
+    # 4️⃣ Extract entities while the reply is generated
+    extraction = asyncio.create_task(extract_entities(user_text))
+    if settings.EXTRACTION_MODE == "sequential":
+        await extraction
 
     # =====================================================
     # 🤖 Generate Mistral Response (General Reply)
     # =====================================================
 
-    ai_reply = call_mistral(user_text).strip()
+    history = context.render()
+    prompt = f"{history}\n\nUser message:\n{user_text}" if history else user_text
+
+    try:
+        ai_reply = (await call_mistral(prompt, session=conversation_id)).strip()
+    except asyncio.CancelledError:
+        extraction.cancel()
+        raise
 
     if not ai_reply:
         ai_reply = "I'm here to listen. Please tell me more."
 
+    # 5️⃣ Merge entities (completion % updates incrementally)
+    state.merge(await extraction, message_id=user_message.id)
+
     # =====================================================
     # 🧠 Ask Intake Question (if incomplete)
     # =====================================================
 
     question = None
 
-    if incident.completion_percentage < 0.7:
-        question = generate_next_question(incident.data)
+    if state.completion < 0.7:
+        question = generate_next_question(state)
 
     # Combine response + intake question
     if question:
@@ -149,18 +121,11 @@ def handle_text_message(
     else:
         final_reply = ai_reply
 
-    # 6️⃣ Save Assistant message
-    db.add(
-        Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=final_reply,
-        )
-    )
-    db.commit()
+    # 6️⃣ Save incident changes + Assistant message
+    await uow.finish(final_reply, state)
 
     return {
         "phase": "normal",
         "reply": final_reply,
-        "completion": incident.completion_percentage,
+        "completion": state.completion,
     }
\ No newline at end of file
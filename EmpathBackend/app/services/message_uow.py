@@ -0,0 +1,99 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Conversation, Message, Incident
+from app.services.incident_service import (
+    IncidentState,
+    new_incident_data,
+    save_incident_state
+)
+
+
+class MessageUnitOfWork:
+    """
+    Groups the DB writes of one chat turn into as few transactions as possible:
+
+    1. `load()` fetches the conversation and its incident in one query.
+    2. The user message (and a new incident, if any) is committed before
+       generation starts, so it survives a failed or aborted reply.
+    3. `finish()` writes the incident patch and the assistant reply in
+       one final commit.
+
+    For canned replies (safety routes) both messages go in a single commit.
+
+    The session must not expire objects on commit (AsyncSessionLocal
+    doesn't), so reading message ids or incident data afterwards needs
+    no refresh SELECT.
+    """
+
+    def __init__(self, db: AsyncSession, conversation_id: str, user_id=None):
+        self.db = db
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.conversation = None
+        self.incident = None
+
+    async def load(self):
+        query = (
+            select(Conversation, Incident)
+            .outerjoin(Incident, Incident.conversation_id == Conversation.id)
+            .where(Conversation.id == self.conversation_id)
+            .limit(1)
+        )
+        if self.user_id is not None:
+            query = query.where(Conversation.user_id == self.user_id)
+
+        row = (await self.db.execute(query)).first()
+        if row is not None:
+            self.conversation, self.incident = row
+
+        return self.conversation
+
+    def bind(self, db: AsyncSession):
+        """
+        Continue the turn on another session, e.g. one owned by a reply
+        that outlives its request.
+        """
+        self.db = db
+
+    def add_message(self, role: str, content: str) -> Message:
+        message = Message(
+            conversation_id=self.conversation_id,
+            role=role,
+            content=content
+        )
+        self.db.add(message)
+        return message
+
+    def incident_state(self) -> IncidentState:
+        """
+        State of the conversation's incident, creating the incident
+        (pending until the next commit) if there isn't one yet.
+        """
+        if self.incident is None:
+            self.incident = Incident(
+                conversation_id=self.conversation_id,
+                data=new_incident_data(),
+                completion_percentage=0.0
+            )
+            self.db.add(self.incident)
+
+        return IncidentState(self.incident.data)
+
+    async def commit(self):
+        try:
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+    async def finish(self, reply: str, state: IncidentState | None = None) -> Message:
+        """
+        Persist the incident changes and the assistant reply together.
+        """
+        if state is not None and self.incident is not None:
+            await save_incident_state(self.db, self.incident, state)
+
+        message = self.add_message("assistant", reply)
+        await self.commit()
+        return message
@@ -0,0 +1,60 @@
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+async def cursor_key(db: AsyncSession, sort_key: tuple, id_column, cursor_id: str, *filters):
+    """
+    Sort-key values of the row with id `cursor_id`, or 400 if it
+    doesn't exist (or fails `filters`).
+    """
+    row = (
+        await db.execute(select(*sort_key).where(id_column == cursor_id, *filters))
+    ).first()
+
+    if row is None:
+        raise HTTPException(status_code=400, detail="Unknown pagination cursor")
+
+    return tuple(row)
+
+
+async def keyset_page(
+    db: AsyncSession,
+    query,
+    sort_key: tuple,
+    *,
+    before: tuple | None = None,
+    after: tuple | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    """
+    One page of `query` in ascending `sort_key` order, e.g.
+    (created_at, id), using a row comparison instead of OFFSET.
+
+    - `after`: the first `limit` rows following that key
+    - `before`: the last `limit` rows preceding that key
+    - neither: the last `limit` rows (most recent page)
+
+    Returns (rows, has_more), where has_more says whether rows exist
+    beyond the page in the direction being paged.
+    """
+    key = tuple_(*sort_key)
+
+    if after is not None:
+        query = query.where(key > tuple_(*after)).order_by(*sort_key)
+    else:
+        if before is not None:
+            query = query.where(key < tuple_(*before))
+        query = query.order_by(*(col.desc() for col in sort_key))
+
+    rows = list((await db.scalars(query.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if after is None:
+        rows.reverse()
+
+    return rows, has_more
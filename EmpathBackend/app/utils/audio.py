@@ -0,0 +1,32 @@
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def decode_audio(data: bytes, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an uploaded audio blob to mono float32 PCM at `sr`, in memory.
+
+    Same ffmpeg conversion Whisper does for a file path, but fed through
+    stdin so nothing touches the disk. The result can be passed straight
+    to whisper_model.transcribe and predict_speech_emotion.
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sr),
+        "pipe:1",
+    ]
+
+    proc = subprocess.run(cmd, input=data, capture_output=True)
+    if proc.returncode != 0:
+        raise ValueError(f"Failed to decode audio: {proc.stderr.decode(errors='ignore')[-200:]}")
+
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
@@ -1,2 +1,145 @@
-def sse_event(data: dict):
-    return f"data: {data}\n\n"
+import asyncio
+import json
+import time
+
+from app.core.config import settings
+
+
+def sse_event(data: dict, event_id: str | int | None = None) -> str:
+    """
+    One Server-Sent Events frame with a JSON payload.
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    if event_id is None:
+        return f"data: {payload}\n\n"
+    return f"id: {event_id}\ndata: {payload}\n\n"
+
+
+def sse_comment(text: str = "") -> str:
+    """
+    A comment frame; clients ignore it, proxies see traffic.
+    """
+    return f": {text}\n\n"
+
+
+class SSEStream:
+    """
+    Encodes one reply as numbered SSE frames.
+
+    Model tokens are coalesced: they are buffered until `max_chars`
+    characters have piled up or the oldest has waited `max_delay`
+    seconds, then sent as one {"content": ..., "done": false} frame.
+    That keeps the typing effect while cutting frames (and writes) by
+    an order of magnitude. While upstream is silent (e.g. evaluating a
+    long prompt) a heartbeat comment goes out every `heartbeat` seconds
+    so proxies don't close the connection.
+
+    Every data frame gets the next event id, after `event_prefix`.
+    `heartbeat=0` turns heartbeats off.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_chars: int | None = None,
+        max_delay: float | None = None,
+        heartbeat: float | None = None,
+        event_prefix: str = "",
+    ):
+        self._max_chars = max_chars or settings.SSE_COALESCE_CHARS
+        self._max_delay = (settings.SSE_COALESCE_MS / 1000) if max_delay is None else max_delay
+        self._heartbeat = settings.SSE_HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+        self._prefix = event_prefix
+
+        self.last_id = 0
+        self.text = ""      # token text relayed so far
+
+        self._buffer: list[str] = []
+        self._buffered = 0
+        self._buffered_at = 0.0
+
+    def event(self, data: dict) -> str:
+        """
+        A data frame, preceded by any buffered tokens.
+        """
+        frames = self.flush()
+        self.last_id += 1
+        return frames + sse_event(data, f"{self._prefix}{self.last_id}")
+
+    def content(self, text: str, done: bool = False) -> str:
+        return self.event({"content": text, "done": done})
+
+    def done(self) -> str:
+        return self.content("", done=True)
+
+    def push(self, token: str) -> str:
+        """
+        Buffer a model token; returns a frame once the buffer is due.
+        """
+        # The first token goes out at once so time-to-first-token isn't delayed
+        first = not self.text
+
+        if not self._buffer:
+            self._buffered_at = time.monotonic()
+
+        self._buffer.append(token)
+        self._buffered += len(token)
+        self.text += token
+
+        if first or self._buffered >= self._max_chars or self._due() <= 0:
+            return self.flush()
+        return ""
+
+    def flush(self) -> str:
+        if not self._buffer:
+            return ""
+
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+
+        self.last_id += 1
+        return sse_event({"content": text, "done": False}, f"{self._prefix}{self.last_id}")
+
+    def _due(self) -> float:
+        return self._buffered_at + self._max_delay - time.monotonic()
+
+    async def relay(self, tokens):
+        """
+        Frames for the async iterator `tokens`: coalesced content plus
+        heartbeats. A partial buffer is flushed on time even if the next
+        token is slow to arrive.
+        """
+        iterator = tokens.__aiter__()
+        pending = None
+
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+
+                timeout = max(self._due(), 0) if self._buffer else (self._heartbeat or None)
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+
+                if not done:
+                    yield self.flush() if self._buffer else sse_comment("keep-alive")
+                    continue
+
+                try:
+                    token = pending.result()
+                except StopAsyncIteration:
+                    pending = None
+                    break
+                pending = None
+
+                frame = self.push(token)
+                if frame:
+                    yield frame
+
+            frame = self.flush()
+            if frame:
+                yield frame
+
+        finally:
+            if pending is not None:
+                pending.cancel()
@@ -0,0 +1,97 @@
+"""
+A stand-in for the llama.cpp server's /completion endpoint, for local
+testing without a model.
+
+    python -m uvicorn benchmarks.llama_stub:app --port 8081
+
+It models what matters for prompt caching: N slots, each remembering the
+tokens (here: whitespace-separated words) of its last prompt. A request
+only "evaluates" the part of its prompt that isn't a prefix of the
+chosen slot's cache, sleeping STUB_MS_PER_TOKEN per token, and reports
+it in `timings` the way llama.cpp does. `id_slot` picks the slot;
+without it (or -1) the least recently used slot is taken.
+
+Settings come from the environment: STUB_SLOTS (4), STUB_MS_PER_TOKEN
+(0.5), STUB_REPLY ("I hear you. Please tell me more."). GET /health
+answers like llama.cpp's.
+"""
+import asyncio
+import json
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SLOTS = int(os.getenv("STUB_SLOTS", "4"))
+MS_PER_TOKEN = float(os.getenv("STUB_MS_PER_TOKEN", "0.5"))
+REPLY = os.getenv("STUB_REPLY", "I hear you. Please tell me more.")
+
+app = FastAPI()
+
+# Per slot: cached prompt tokens and last use
+slot_cache = [[] for _ in range(SLOTS)]
+slot_used = [0.0] * SLOTS
+slot_locks = [asyncio.Lock() for _ in range(SLOTS)]
+
+
+def common_prefix(a: list, b: list) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+async def evaluate(body: dict) -> tuple[int, dict]:
+    slot = body.get("id_slot", -1)
+    if slot is None or slot < 0 or slot >= SLOTS:
+        slot = min(range(SLOTS), key=lambda i: slot_used[i])
+
+    tokens = body.get("prompt", "").split()
+
+    async with slot_locks[slot]:
+        cached = common_prefix(slot_cache[slot], tokens) if body.get("cache_prompt") else 0
+        evaluated = len(tokens) - cached
+
+        started = time.perf_counter()
+        await asyncio.sleep(evaluated * MS_PER_TOKEN / 1000)
+        prompt_ms = (time.perf_counter() - started) * 1000
+
+        slot_cache[slot] = tokens
+        slot_used[slot] = time.monotonic()
+
+    return slot, {
+        "prompt_n": evaluated,
+        "prompt_ms": prompt_ms,
+        "cache_n": cached,
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/completion")
+async def completion(request: Request):
+    body = await request.json()
+    slot, timings = await evaluate(body)
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "content": REPLY,
+            "id_slot": slot,
+            "tokens_cached": timings["cache_n"],
+            "timings": timings,
+            "stop": True,
+        })
+
+    async def chunks():
+        for word in REPLY.split(" "):
+            yield f"data: {json.dumps({'content': word + ' ', 'stop': False})}\n\n"
+            await asyncio.sleep(0.005)
+        yield f"data: {json.dumps({'content': '', 'stop': True, 'id_slot': slot, 'timings': timings})}\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
@@ -0,0 +1,130 @@
+"""
+Counts the SQL statements one chat turn costs, before and after the
+MessageUnitOfWork change.
+
+    python -m benchmarks.queries_per_message --conversation-id <id> [--turns 3]
+
+Replays only the DB side of the message pipeline (fixed reply and
+extracted fields, no LLM calls) on the async engine, inside an outer
+transaction that is rolled back at the end, so the conversation is left
+untouched. Session commits show up as RELEASE SAVEPOINT statements.
+The first turn creates the incident, later turns update it.
+"""
+import argparse
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event, select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_engine
+from app.models import Conversation, Message, Incident
+from app.services.incident_service import (
+    FIELDS,
+    IncidentState,
+    new_incident_data,
+    save_incident_state
+)
+from app.services.message_uow import MessageUnitOfWork
+
+REPLY = "I'm here with you. Please tell me more."
+
+
+def extracted_for(turn: int) -> dict:
+    return {FIELDS[turn % 16]: f"value {turn}"}
+
+
+async def legacy_turn(db: AsyncSession, conversation_id: str, turn: int):
+    """
+    The pipeline as it was: a commit per write, expiring everything each
+    time (the refreshes it caused are explicit here).
+    """
+    await db.scalar(select(Conversation).where(Conversation.id == conversation_id))
+
+    user_message = Message(conversation_id=conversation_id, role="user", content=f"message {turn}")
+    db.add(user_message)
+    await db.commit()
+
+    incident = await db.scalar(select(Incident).where(Incident.conversation_id == conversation_id))
+    if not incident:
+        incident = Incident(
+            conversation_id=conversation_id,
+            data=new_incident_data(),
+            completion_percentage=0.0
+        )
+        db.add(incident)
+        await db.commit()
+        await db.refresh(incident)
+
+    await db.refresh(user_message)
+    state = IncidentState(incident.data)
+    state.merge(extracted_for(turn), message_id=user_message.id)
+
+    await save_incident_state(db, incident, state)
+    db.add(Message(conversation_id=conversation_id, role="assistant", content=REPLY))
+    await db.commit()
+
+
+async def uow_turn(db: AsyncSession, conversation_id: str, turn: int):
+    uow = MessageUnitOfWork(db, conversation_id)
+    await uow.load()
+
+    user_message = uow.add_message("user", f"message {turn}")
+    state = uow.incident_state()
+    await uow.commit()
+
+    state.merge(extracted_for(turn), message_id=user_message.id)
+    await uow.finish(REPLY, state)
+
+
+@contextmanager
+def count_statements(connection):
+    counts = Counter()
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts[statement.split(None, 1)[0].upper()] += 1
+
+    event.listen(connection, "before_cursor_execute", on_execute)
+    try:
+        yield counts
+    finally:
+        event.remove(connection, "before_cursor_execute", on_execute)
+
+
+async def run(label: str, turn_fn, conversation_id: str, turns: int, expire_on_commit: bool):
+    async with async_engine.connect() as connection:
+        outer = await connection.begin()
+
+        await connection.execute(delete(Incident).where(Incident.conversation_id == conversation_id))
+
+        for turn in range(turns):
+            # A fresh session per turn, like one per request
+            db = AsyncSession(
+                bind=connection,
+                join_transaction_mode="create_savepoint",
+                expire_on_commit=expire_on_commit,
+            )
+            with count_statements(connection.sync_connection) as counts:
+                await turn_fn(db, conversation_id, turn)
+            await db.close()
+
+            detail = ", ".join(f"{k} {v}" for k, v in sorted(counts.items()))
+            print(f"{label:<10} turn {turn + 1}: {sum(counts.values()):>3} statements  ({detail})")
+
+        await outer.rollback()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversation-id", required=True)
+    parser.add_argument("--turns", type=int, default=3)
+    args = parser.parse_args()
+
+    await run("before", legacy_turn, args.conversation_id, args.turns, expire_on_commit=True)
+    await run("after", uow_turn, args.conversation_id, args.turns, expire_on_commit=False)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Microbenchmark for the safety router, which runs on every message.
+
+    python -m benchmarks.safety_router [--n 20000]
+
+Compares the compiled SafetyEngine against the previous approach of
+lowercasing and scanning the text once per keyword, first with the
+shipped keyword sets and then with larger synthetic ones (the legacy
+cost grows with every keyword added, the engine's does not).
+"""
+import argparse
+import random
+import time
+
+from app.llm.incident_assistant.safety.router import SafetyEngine, safety_engine, route_request
+
+LEGACY_MURDER = ["i killed", "i murdered", "i stabbed", "i shot", "i strangled", "i buried the body"]
+LEGACY_ABUSE = ["molested", "touched me", "rape", "sexual abuse", "forced me", "uncle touched"]
+
+SAMPLES = [
+    "help",
+    "I don't know what to do anymore, he keeps calling me at night.",
+    "My neighbour has been following me to work every day for a month and "
+    "I am scared to report it because he knows where my family lives.",
+    "I killed him",
+    "my uncle touched me when I was alone at home",
+    "Can you explain what an FIR is and how long it takes?",
+]
+
+
+def legacy_route(text: str, age: int | None) -> str:
+    lowered = text.lower()
+    if any(k in lowered for k in LEGACY_MURDER):
+        return "HIGH_RISK"
+    if age is not None and age < 18 and any(k in lowered for k in LEGACY_ABUSE):
+        return "POCSO"
+    return "NORMAL"
+
+
+def bench(label: str, fn, n: int):
+    started = time.perf_counter()
+    fn(n)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {n / elapsed:>12,.0f} msg/s   {elapsed / n * 1e6:8.2f} µs/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [rng.choice(SAMPLES) for _ in range(args.n)]
+    ages = [rng.choice([None, 15, 30]) for _ in range(args.n)]
+
+    print(f"keywords v{safety_engine.version}, {args.n} messages")
+
+    bench("legacy per-keyword scan", lambda n: [legacy_route(t, a) for t, a in zip(texts, ages)], args.n)
+    bench("SafetyEngine.route", lambda n: [route_request(t, a) for t, a in zip(texts, ages)], args.n)
+    bench("SafetyEngine.route_batch", lambda n: safety_engine.route_batch(texts, ages), args.n)
+
+    for size in (100, 1000):
+        extra = [f"keyword{i} phrase{i}" for i in range(size)]
+        murder, abuse = LEGACY_MURDER + extra, LEGACY_ABUSE + extra
+        engine = SafetyEngine({"murder_confession": murder, "minor_sexual_abuse": abuse})
+
+        def legacy(n):
+            for text in texts:
+                lowered = text.lower()
+                any(k in lowered for k in murder) or any(k in lowered for k in abuse)
+
+        print(f"\n+{size} keywords per category")
+        bench("legacy per-keyword scan", legacy, args.n)
+        bench("SafetyEngine.scan_batch", lambda n: engine.scan_batch(texts), args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Prompt-processing time per turn with and without slot affinity.
+
+    python -m benchmarks.slot_affinity [--conversations 4] [--turns 8] [--url URL]
+
+Without --url it starts benchmarks.llama_stub in-process. Each
+conversation's prompt is a fixed system part plus its growing history,
+and turns of different conversations arrive in random order. With
+affinity every conversation keeps its slot (and KV cache); without it
+the server picks a slot and most turns re-evaluate the whole prompt.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import uvicorn
+
+from benchmarks import llama_stub
+from app.services.llm_client import LLMClient
+
+SYSTEM = " ".join(f"system{i}" for i in range(300))
+TURN = " ".join(f"word{i}" for i in range(40))
+
+
+def make_client(url: str, slots: int) -> LLMClient:
+    return LLMClient(
+        [url],
+        connect_timeout=5,
+        read_timeout=60,
+        max_connections=8,
+        max_keepalive=8,
+        max_concurrency=4,
+        slots=slots,
+    )
+
+
+async def run(client: LLMClient, conversations: int, turns: int, seed: int = 0) -> list[float]:
+    rng = random.Random(seed)
+    schedule = [c for c in range(conversations) for _ in range(turns)]
+    rng.shuffle(schedule)
+
+    history = {c: [] for c in range(conversations)}
+    timings = []
+
+    for c in schedule:
+        history[c].append(f"user{c}: {TURN}")
+        prompt = SYSTEM + " " + " ".join(history[c])
+
+        started = time.perf_counter()
+        reply = await client.complete(
+            {"prompt": prompt, "n_predict": 32, "temperature": 0.7, "cache_prompt": True},
+            session=f"conversation-{c}",
+        )
+        if len(history[c]) > 1:
+            timings.append(time.perf_counter() - started)
+
+        history[c].append(f"assistant: {reply}")
+
+    await client.aclose()
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=llama_stub.SLOTS)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--url", help="existing llama.cpp /completion URL")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        config = uvicorn.Config(llama_stub.app, port=8765, log_level="warning")
+        server = uvicorn.Server(config)
+        asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        url = "http://127.0.0.1:8765/completion"
+
+    for label, slots in (("no affinity", 0), ("slot affinity", llama_stub.SLOTS)):
+        if server is not None:
+            llama_stub.slot_cache[:] = [[] for _ in range(llama_stub.SLOTS)]
+
+        timings = await run(make_client(url, slots), args.conversations, args.turns)
+        print(
+            f"{label:<14} turns 2+: mean {statistics.mean(timings) * 1000:7.1f} ms   "
+            f"p95 {sorted(timings)[int(len(timings) * 0.95)] * 1000:7.1f} ms"
+        )
+
+    if server is not None:
+        server.should_exit = True
+        await asyncio.sleep(0.2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api import auth
 from app.api import conversations
 from app.api import user
 from app.api import analyze  
 
-from app.core.database import Base, engine
+from app.core.config import settings
+from app.core.database import Base, engine, async_engine
+from app.core.indexes import ensure_indexes
+from app.core import metrics
+from app.llm.registry import registry
+from app.services.llm_client import llm_client
+from app.services.context_builder import load_encoding
+from app.llm.inference import inference_executor
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine)
+
+
+WARM_MODELS = [m.strip() for m in settings.WARM_MODELS.split(",") if m.strip()]
+
+# A misspelled name would otherwise keep /ready at 503 forever
+registry.validate(WARM_MODELS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm models in the background so the server accepts requests right away
+    warm_up = asyncio.create_task(registry.warm_up(WARM_MODELS))
+    # The tokenizer may be downloaded on first load; keep that off the loop
+    tokenizer = asyncio.create_task(asyncio.to_thread(load_encoding))
+    llm_client.start_health_checks()
+    yield
+    warm_up.cancel()
+    tokenizer.cancel()
+    await llm_client.aclose()
+    inference_executor.shutdown()
+    await async_engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,3 +68,18 @@ app.include_router(analyze.router)
 @app.get("/")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    models = registry.status()
+    is_ready = all(models.get(name, {}).get("loaded") for name in WARM_MODELS)
+    return JSONResponse(
+        {"ready": is_ready, "models": models, "llm_backends": llm_client.status()},
+        status_code=200 if is_ready else 503,
+    )
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,5 @@
+import os
+
+# Settings require these; the tests below never touch the database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET", "test")
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from app.llm.incident_assistant.safety.router import route_request, safety_engine
+
+# The keyword lists and substring check the router used before SafetyEngine
+BASELINE = {
+    "murder_confession": ["i killed", "i murdered", "i stabbed", "i shot", "i strangled", "i buried the body"],
+    "minor_sexual_abuse": ["molested", "touched me", "rape", "sexual abuse", "forced me", "uncle touched"],
+}
+
+MESSAGES = [
+    "i was raped",
+    "they raped me",
+    "i'm scared he raped my sister",
+    "he is a sexual abuser",
+    "my teacher keeps forcing me to stay after class",
+    "my coach molested me last year",
+    "he rapes girls in our street",
+    "Uncle touched me. I didn't tell anyone",
+    "he TOUCHED ME when nobody was home",
+    "I killed him",
+    "i stabbed my brother",
+    "I shot a video at school today",
+    "she forced me to eat",
+    "we ate a bunch of grapes",
+    "my friend gave me grape juice",
+    "the drapes in my room are torn",
+    "scrapes on my knee",
+    "help me please",
+]
+
+
+def baseline_hits(text: str) -> set[str]:
+    """
+    Baseline substring hits, limited to those that start at a word
+    (the baseline's mid-word hits like "grape" are deliberately dropped).
+    """
+    lowered = text.lower()
+    return {
+        category
+        for category, keywords in BASELINE.items()
+        if any(re.search(r"\b" + re.escape(k), lowered) for k in keywords)
+    }
+
+
+@pytest.mark.parametrize("text", MESSAGES)
+def test_keeps_baseline_word_hits(text):
+    assert baseline_hits(text) <= safety_engine.scan(text)
+
+
+@pytest.mark.parametrize("text", [
+    "i was raped",
+    "they raped me",
+    "i'm scared he raped my sister",
+    "sexual abuser",
+    "he was raping her",
+    "he molests kids",
+    "my stepfather sexually abused me",
+    "he keeps forcing me",
+])
+def test_inflected_abuse_routes_to_pocso_for_minors(text):
+    assert route_request(text, 15)["mode"] == "POCSO"
+    assert route_request(text, 30)["mode"] == "NORMAL"
+
+
+@pytest.mark.parametrize("text", ["we ate grapes", "drapes", "scrapes on my knee", "he touched meat"])
+def test_no_mid_word_hits(text):
+    assert route_request(text, 15)["mode"] == "NORMAL"
+
+
+def test_murder_confession_wins():
+    assert route_request("I killed the man who raped me", 15)["mode"] == "HIGH_RISK"
@@ -1,6 +1,7 @@
 import { useRef, useEffect } from 'react';
 import { ChatMessage } from './ChatMessage';
 import type { Message } from '@/types';
+import { Button } from '@/components/ui/button';
 import { Loader2 } from 'lucide-react';
 
 interface MessageListProps {
@@ -8,6 +9,9 @@ interface MessageListProps {
   isLoading?: boolean;
   isStreaming?: boolean;
   streamingContent?: string;
+  hasMore?: boolean;
+  isLoadingMore?: boolean;
+  onLoadEarlier?: () => void;
 }
 
 export function MessageList({
@@ -15,12 +19,17 @@ export function MessageList({
   isLoading,
   isStreaming,
   streamingContent,
+  hasMore,
+  isLoadingMore,
+  onLoadEarlier,
 }: MessageListProps) {
   const bottomRef = useRef<HTMLDivElement>(null);
+  const lastMessageId = messages[messages.length - 1]?.id;
 
+  // Follow new messages, but stay put when earlier ones are prepended
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: 'smooth' });
-  }, [messages, streamingContent]);
+  }, [lastMessageId, streamingContent]);
 
   if (isLoading) {
     return (
@@ -36,6 +45,14 @@ export function MessageList({
 
   return (
     <div className="flex-1 overflow-y-auto">
+      {hasMore && onLoadEarlier && (
+        <div className="flex justify-center py-3">
+          <Button variant="ghost" size="sm" onClick={onLoadEarlier} disabled={isLoadingMore}>
+            {isLoadingMore && <Loader2 className="mr-2 h-4 w-4 animate-spin" />}
+            Load earlier messages
+          </Button>
+        </div>
+      )}
       {messages.map((message) => (
         <ChatMessage
           key={message.id}
@@ -34,7 +34,13 @@ interface SidebarProps {
 export function Sidebar({ isOpen, onToggle }: SidebarProps) {
   const navigate = useNavigate();
   const { user, logout } = useAuth();
-  const { createConversation, getGroupedConversations } = useChat();
+  const {
+    createConversation,
+    getGroupedConversations,
+    hasMoreConversations,
+    isLoadingMore,
+    loadMoreConversations,
+  } = useChat();
   const { theme, setTheme, resolvedTheme } = useTheme();
 
   const groupedConversations = getGroupedConversations();
@@ -137,6 +143,17 @@ export function Sidebar({ isOpen, onToggle }: SidebarProps) {
               conversations={groupedConversations.older}
             />
           )}
+          {hasMoreConversations && (
+            <Button
+              variant="ghost"
+              size="sm"
+              className="my-2 w-full text-muted-foreground"
+              onClick={loadMoreConversations}
+              disabled={isLoadingMore}
+            >
+              Load more
+            </Button>
+          )}
         </ScrollArea>
 
         {/* Footer */}
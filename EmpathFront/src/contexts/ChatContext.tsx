@@ -7,10 +7,15 @@ interface ChatContextType {
   currentConversation: Conversation | null;
   messages: Message[];
   isLoading: boolean;
+  isLoadingMore: boolean;
+  hasMoreConversations: boolean;
+  hasMoreMessages: boolean;
   isStreaming: boolean;
   streamingContent: string;
   loadConversations: () => Promise<void>;
+  loadMoreConversations: () => Promise<void>;
   selectConversation: (id: string) => Promise<void>;
+  loadEarlierMessages: () => Promise<void>;
   createConversation: () => Promise<Conversation | null>;
   deleteConversation: (id: string) => Promise<void>;
   deleteAllConversations: () => Promise<void>;
@@ -26,6 +31,9 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
   const [currentConversation, setCurrentConversation] = useState<Conversation | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [isLoading, setIsLoading] = useState(false);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [hasMoreConversations, setHasMoreConversations] = useState(false);
+  const [hasMoreMessages, setHasMoreMessages] = useState(false);
   const [isStreaming, setIsStreaming] = useState(false);
   const [streamingContent, setStreamingContent] = useState('');
 
@@ -34,10 +42,29 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
     const response = await conversationsApi.getAll();
     if (response.success && response.data) {
       setConversations(response.data.conversations);
+      setHasMoreConversations(!!response.data.hasMore);
     }
     setIsLoading(false);
   }, []);
 
+  // The list comes a page at a time; fetch the next (older) page
+  const loadMoreConversations = useCallback(async () => {
+    const oldest = conversations[conversations.length - 1];
+    if (!oldest || isLoadingMore) return;
+
+    setIsLoadingMore(true);
+    const response = await conversationsApi.getAll(oldest.id);
+    if (response.success && response.data) {
+      const older = response.data.conversations;
+      setConversations((prev) => [
+        ...prev,
+        ...older.filter((c) => !prev.some((p) => p.id === c.id)),
+      ]);
+      setHasMoreConversations(!!response.data.hasMore);
+    }
+    setIsLoadingMore(false);
+  }, [conversations, isLoadingMore]);
+
   const selectConversation = useCallback(async (id: string) => {
     const conversation = conversations.find((c) => c.id === id);
     if (conversation) {
@@ -46,11 +73,27 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
       const response = await conversationsApi.getMessages(id);
       if (response.success && response.data) {
         setMessages(response.data.messages);
+        setHasMoreMessages(!!response.data.hasMore);
       }
       setIsLoading(false);
     }
   }, [conversations]);
 
+  // Messages open on the latest page; prepend the page before it
+  const loadEarlierMessages = useCallback(async () => {
+    const earliest = messages[0];
+    if (!currentConversation || !earliest || isLoadingMore) return;
+
+    setIsLoadingMore(true);
+    const response = await conversationsApi.getMessages(currentConversation.id, earliest.id);
+    if (response.success && response.data) {
+      const earlier = response.data.messages;
+      setMessages((prev) => [...earlier, ...prev]);
+      setHasMoreMessages(!!response.data.hasMore);
+    }
+    setIsLoadingMore(false);
+  }, [currentConversation, messages, isLoadingMore]);
+
   const createConversation = useCallback(async () => {
     const response = await conversationsApi.create();
     if (response.success && response.data) {
@@ -58,6 +101,7 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
       setConversations((prev) => [newConversation, ...prev]);
       setCurrentConversation(newConversation);
       setMessages([]);
+      setHasMoreMessages(false);
       return newConversation;
     }
     return null;
@@ -70,6 +114,7 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
       if (currentConversation?.id === id) {
         setCurrentConversation(null);
         setMessages([]);
+        setHasMoreMessages(false);
       }
     }
   }, [currentConversation]);
@@ -78,8 +123,10 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
     const response = await conversationsApi.deleteAll();
     if (response.success) {
       setConversations([]);
+      setHasMoreConversations(false);
       setCurrentConversation(null);
       setMessages([]);
+      setHasMoreMessages(false);
     }
   }, []);
 
@@ -260,10 +307,15 @@ const sendAudioMessage = useCallback(async (file: File) => {
         currentConversation,
         messages,
         isLoading,
+        isLoadingMore,
+        hasMoreConversations,
+        hasMoreMessages,
         isStreaming,
         streamingContent,
         loadConversations,
+        loadMoreConversations,
         selectConversation,
+        loadEarlierMessages,
         createConversation,
         deleteConversation,
         deleteAllConversations,
@@ -12,9 +12,12 @@ export default function Chat() {
     currentConversation,
     messages,
     isLoading,
+    isLoadingMore,
+    hasMoreMessages,
     isStreaming,
     streamingContent,
     loadConversations,
+    loadEarlierMessages,
     createConversation,
     sendMessage,
     sendAudioMessage
@@ -57,6 +60,9 @@ const handleSendAudio = async (file: File) => {
             isLoading={isLoading}
             isStreaming={isStreaming}
             streamingContent={streamingContent}
+            hasMore={hasMoreMessages}
+            isLoadingMore={isLoadingMore}
+            onLoadEarlier={loadEarlierMessages}
           />
         )}
         <ChatInput
@@ -111,7 +111,11 @@ export const userApi = {
 
 // Conversations API
 export const conversationsApi = {
-  getAll: () => apiCall<ConversationsResponse>('/conversations'),
+  // Newest first; pass the oldest loaded conversation's id for the next page
+  getAll: (before?: string) =>
+    apiCall<ConversationsResponse>(
+      `/conversations${before ? `?before=${encodeURIComponent(before)}` : ''}`
+    ),
 
   create: (title?: string) =>
     apiCall<Conversation>('/conversations', {
@@ -129,8 +133,11 @@ export const conversationsApi = {
       method: 'DELETE',
     }),
 
-  getMessages: (id: string) =>
-    apiCall<MessagesResponse>(`/conversations/${id}/messages`),
+  // Latest page; pass the earliest loaded message's id for the one before
+  getMessages: (id: string, before?: string) =>
+    apiCall<MessagesResponse>(
+      `/conversations/${id}/messages${before ? `?before=${encodeURIComponent(before)}` : ''}`
+    ),
   
 
   sendAudio: async (conversationId: string, file: File): Promise<Response> => {
@@ -199,6 +206,7 @@ export const apiResponseStructures = {
         preview: 'string (first message preview)',
       },
     ],
+    hasMore: 'boolean (older conversations exist: GET /conversations?before=<id>)',
   },
 
   // GET /conversations/:id/messages
@@ -212,6 +220,7 @@ export const apiResponseStructures = {
         createdAt: 'ISO date string',
       },
     ],
+    hasMore: 'boolean (earlier messages exist: GET /conversations/:id/messages?before=<id>)',
   },
 
   // POST /conversations/:id/messages (Streaming Response)
@@ -63,10 +63,12 @@ export interface ApiResponse<T> {
 
 export interface ConversationsResponse {
   conversations: Conversation[];
+  hasMore?: boolean;
 }
 
 export interface MessagesResponse {
   messages: Message[];
+  hasMore?: boolean;
 }
 
 export interface ProfileUpdateRequest {